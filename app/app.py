@@ -1,9 +1,15 @@
 import reflex as rx
+from starlette.applications import Starlette
+from starlette.routing import Route
 from app.components.charts import plots_area
 from app.components.header import header
 from app.components.controls import upload_page
 from app.components.modals import add_chart_modal, export_modal, import_modal
 from app.states.data_state import DataState
+from app.states.slice_state import SliceState
+from app.data.uploads import collect_uploads_periodically
+from app.metrics import METRICS_ROUTE, metrics_endpoint
+from app.tracing import TRACE_ROUTE, trace_endpoint
 
 
 def dashboard() -> rx.Component:
@@ -49,7 +55,7 @@ def index() -> rx.Component:
                 class_name="flex items-center justify-center min-h-screen",
             ),
         ),
-        on_mount=DataState.load_data_from_storage,
+        on_mount=SliceState.restore_slices,
         class_name="font-['Inter'] bg-gray-100",
     )
 
@@ -64,5 +70,12 @@ app = rx.App(
             rel="stylesheet",
         ),
     ],
+    api_transformer=Starlette(
+        routes=[
+            Route(METRICS_ROUTE, metrics_endpoint),
+            Route(TRACE_ROUTE, trace_endpoint),
+        ]
+    ),
 )
-app.add_page(index, route="/")
\ No newline at end of file
+app.add_page(index, route="/")
+app.register_lifespan_task(collect_uploads_periodically)
\ No newline at end of file
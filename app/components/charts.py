@@ -1,5 +1,5 @@
 import reflex as rx
-from app.states.data_state import DataState
+from app.states.data_state import DataState, plot_figures
 from app.states.plot_state import PlotState
 from app.states.slice_state import SliceState
 
@@ -36,10 +36,20 @@ def plot_card(plot: dict, index: int) -> rx.Component:
                     ),
                     class_name="flex flex-col items-center justify-center w-full h-full",
                 ),
-                rx.plotly(
-                    data=DataState.plot_figures[index],
-                    use_resize_handler=True,
-                    style={"width": "100%", "height": "100%"},
+                rx.cond(
+                    plot_figures.value[plot["id"].to(str)],
+                    rx.plotly(
+                        data=plot_figures.value[plot["id"].to(str)],
+                        use_resize_handler=True,
+                        style={"width": "100%", "height": "100%"},
+                    ),
+                    rx.el.div(
+                        rx.icon(
+                            tag="loader",
+                            class_name="h-8 w-8 animate-spin text-blue-600",
+                        ),
+                        class_name="flex items-center justify-center w-full h-full",
+                    ),
                 ),
             ),
             class_name="w-full h-[400px]",
@@ -54,6 +64,7 @@ def plots_area() -> rx.Component:
         SliceState.plots.length() > 0,
         rx.el.div(
             rx.foreach(DataState.plots_with_figures, plot_card),
+            on_mount=DataState.push_figures,
             class_name=rx.match(
                 DataState.grid_columns,
                 (1, "grid grid-cols-1 gap-8 w-full"),
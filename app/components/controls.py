@@ -57,6 +57,19 @@ def upload_page() -> rx.Component:
                 class_name="w-full mt-6 px-4 py-3 bg-blue-600 text-white font-semibold rounded-lg hover:bg-blue-700 transition-colors disabled:bg-gray-400",
                 disabled=DataState.is_loading,
             ),
+            rx.cond(
+                (DataState.data_columns.length() > 0) & DataState.show_upload_page,
+                rx.el.button(
+                    "Merge as Update",
+                    on_click=DataState.handle_merge_upload(
+                        rx.upload_files(upload_id="csv_upload")
+                    ),
+                    title="Replace rows with the same Variable, Area and Year, and add the rest, keeping your slices.",
+                    class_name="w-full mt-2 px-4 py-3 bg-white text-blue-600 font-semibold rounded-lg border border-blue-600 hover:bg-blue-50 transition-colors disabled:text-gray-400 disabled:border-gray-300",
+                    disabled=DataState.is_loading,
+                ),
+                rx.fragment(),
+            ),
             rx.cond(
                 (DataState.data_columns.length() > 0) & DataState.show_upload_page,
                 rx.el.button(
@@ -120,7 +133,7 @@ def series_multiselect() -> rx.Component:
         rx.el.div(
             rx.el.input(
                 placeholder="Filter series...",
-                on_change=PlotState.set_series_filter_text,
+                on_change=PlotState.set_series_filter_text.debounce(150),
                 class_name="w-full p-1 text-xs border border-gray-300 rounded-md shadow-sm focus:ring-blue-500 focus:border-blue-500",
                 default_value=PlotState.series_filter_text,
                 id="filter_series",
@@ -0,0 +1,143 @@
+import asyncio
+import ctypes
+import os
+from collections.abc import AsyncIterator, Iterator
+from contextlib import contextmanager
+from app.data.registry import evict_least_recent
+
+
+def _physical_memory() -> int:
+    try:
+        return os.sysconf("SC_PHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (AttributeError, ValueError, OSError):
+        return 0
+
+
+INGEST_SLOTS = int(os.environ.get("DATAVIZ_INGEST_SLOTS", 2))
+# Peak memory of an ingest per byte of CSV: one raw chunk, the compact
+# columns, and the indexes built on first use.
+INGEST_MEMORY_FACTOR = float(os.environ.get("DATAVIZ_INGEST_MEMORY_FACTOR", 1.5))
+# 0 disables the budget.
+MEMORY_BUDGET = int(
+    os.environ.get("DATAVIZ_MEMORY_BUDGET_BYTES", int(_physical_memory() * 0.75))
+)
+
+
+class AdmissionError(RuntimeError):
+    """Raised when an ingest would push the worker over its memory budget."""
+
+
+def resident_memory() -> int:
+    """The worker's current resident set size in bytes, or 0 if unknown."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return 0
+    return pages * os.sysconf("SC_PAGE_SIZE")
+
+
+def _trim_heap():
+    """Hands freed heap pages back to the OS, so ``resident_memory`` drops.
+
+    glibc keeps memory freed by a parse or an evicted dataset mapped for
+    reuse. Elsewhere this does nothing.
+    """
+    try:
+        ctypes.CDLL(None).malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+
+def _format_bytes(n: float) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if n < 1024:
+            return f"{n:.1f} {unit}"
+        n /= 1024
+    return f"{n:.1f} TB"
+
+
+class IngestTicket:
+    """A place in the ingest queue, holding its share of the memory budget."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.reserved = int(size * INGEST_MEMORY_FACTOR)
+
+
+class IngestQueue:
+    """Per-worker admission control for CSV ingests.
+
+    At most ``slots`` ingests run at once and the rest wait in arrival
+    order. Every ticket, running or waiting, reserves an estimate of its
+    peak memory. An ingest is refused up front if its reservation on top
+    of the worker's resident memory and the other reservations would
+    exceed ``budget``.
+
+    For a new upload, "up front" is only after Reflex has received the
+    file and read it into memory, which happens before any handler runs,
+    so the check protects the parse and the indexes but not that copy.
+    """
+
+    def __init__(self, slots: int, budget: int):
+        self.slots = max(1, slots)
+        self.budget = budget
+        self._tickets: list[IngestTicket] = []
+        self._changed = asyncio.Event()
+
+    def _over_budget(self, ticket: IngestTicket) -> bool:
+        reserved = sum(t.reserved for t in self._tickets)
+        return resident_memory() + reserved + ticket.reserved > self.budget
+
+    def _check_budget(self, ticket: IngestTicket):
+        if not self.budget:
+            return
+        if not self._over_budget(ticket):
+            return
+        _trim_heap()
+        # Registered datasets stay resident until newer ones push them out,
+        # even once no session uses them, like the base of a merge. They
+        # are dropped, least recently used first, before an ingest is
+        # refused.
+        while self._over_budget(ticket):
+            if evict_least_recent():
+                _trim_heap()
+                continue
+            raise AdmissionError(
+                f"Not enough memory to process a {_format_bytes(ticket.size)} "
+                "file right now. Please try again later."
+            )
+
+    @contextmanager
+    def ticket(self, size: int) -> Iterator[IngestTicket]:
+        """Queues an ingest of ``size`` bytes for the duration of the block."""
+        ticket = IngestTicket(size)
+        self._check_budget(ticket)
+        self._tickets.append(ticket)
+        try:
+            yield ticket
+        finally:
+            self._tickets.remove(ticket)
+            changed, self._changed = self._changed, asyncio.Event()
+            changed.set()
+
+    def position(self, ticket: IngestTicket) -> int:
+        """How many ingests must finish before ``ticket`` runs, 0 if it may run."""
+        return max(0, self._tickets.index(ticket) - self.slots + 1)
+
+    async def waiting(self, ticket: IngestTicket) -> AsyncIterator[int]:
+        """Yields the queue position of ``ticket`` whenever the queue moves.
+
+        Returns once the ticket may run. The event is taken before the
+        position is read, so a ticket released while the caller handles a
+        yielded position still wakes this waiter.
+        """
+        while True:
+            changed = self._changed
+            if not (position := self.position(ticket)):
+                return
+            yield position
+            await changed.wait()
+
+
+ingest_queue = IngestQueue(INGEST_SLOTS, MEMORY_BUDGET)
\ No newline at end of file
@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+from app.data.index import FilterIndex
+from app.data.ingest import concat_frames
+
+CUBE_KEYS = ["VariableGroup", "Subgroup", "Variable", "Area", "Year", "Unit"]
+
+
+class AggregateCube:
+    """Sum and count of Value per (group, subgroup, variable, area, year, unit).
+
+    Materialized once per dataset, the cube has one row per distinct cell
+    instead of one per observation. Exact means over any chart filter are
+    recombined from it as sum(sum) / sum(count), so bar charts and the
+    Area ranking no longer depend on how many raw rows the export has.
+    """
+
+    def __init__(self, frame: pd.DataFrame):
+        keys = [col for col in CUBE_KEYS if col in frame.columns]
+        self.frame = (
+            frame.groupby(keys, observed=True, dropna=False, sort=False)["Value"]
+            .agg(["sum", "count"])
+            .reset_index()
+        )
+        self.index = FilterIndex(self.frame)
+
+    def merged(self, replaced: np.ndarray, delta: "AggregateCube") -> "AggregateCube":
+        """The cube with the ``replaced`` cells swapped for the cells of ``delta``."""
+        kept = ~replaced
+        merged = AggregateCube.__new__(AggregateCube)
+        merged.frame = concat_frames(self.frame[kept], delta.frame)
+        merged.index = self.index.merged(merged.frame, kept, delta.index)
+        return merged
+
+    def aggregate(
+        self,
+        group_cols: list[str],
+        first_cols: list[str],
+        variable_group: str = "All",
+        subgroup: str = "All",
+        variable: str = "All",
+        series_by: str = "",
+        series_values: list[str] | None = None,
+    ) -> pd.DataFrame:
+        """Returns the mean Value per ``group_cols`` over the filtered cells.
+
+        ``first_cols`` not in ``group_cols`` are carried along with their
+        first value in each group. Groups without any Value are dropped.
+        """
+        cells = self.index.select(
+            variable_group, subgroup, variable, series_by, series_values
+        )
+        cells = cells[cells["count"] > 0]
+        agg_spec = {"sum": ("sum", "sum"), "count": ("count", "sum")}
+        for col in first_cols:
+            if col not in group_cols:
+                agg_spec[col] = (col, "first")
+        df = cells.groupby(group_cols, as_index=False, observed=True).agg(**agg_spec)
+        df["Value"] = df["sum"] / df["count"]
+        return df.drop(columns=["sum", "count"])
+
+    def ranking(
+        self,
+        column: str,
+        variable_group: str = "All",
+        subgroup: str = "All",
+        variable: str = "All",
+    ) -> list[str]:
+        """Values of ``column`` ordered by descending mean Value."""
+        cells = self.index.select(variable_group, subgroup, variable)
+        totals = cells.groupby(column, observed=True)[["sum", "count"]].sum()
+        means = totals["sum"].where(totals["count"] > 0) / totals["count"]
+        return [str(v) for v in means.sort_values(ascending=False).index]
\ No newline at end of file
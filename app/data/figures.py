@@ -0,0 +1,268 @@
+import asyncio
+import contextvars
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+import plotly.graph_objects as go
+from app.data.registry import Dataset
+from app.data.sampling import downsample, point_budget, use_webgl
+from app.data.traces import trace_figure
+from app.states.slice_state import PlotConfig
+from app.tracing import log_if_slow, span
+
+FIGURE_CACHE_MAX_ENTRIES = 512
+FIGURE_CACHE_MAX_BYTES = 256 * 1024 * 1024
+FIGURE_WORKERS = int(
+    os.environ.get("DATAVIZ_FIGURE_WORKERS", min(4, os.cpu_count() or 1))
+)
+
+
+def invalid_figure() -> go.Figure:
+    fig = go.Figure()
+    fig.add_annotation(
+        x=0.5,
+        y=0.5,
+        xref="paper",
+        yref="paper",
+        text="Invalid Plot",
+        showarrow=False,
+        font=dict(size=20, color="red"),
+    )
+    return fig
+
+
+def build_figure(dataset: Dataset, config_model: PlotConfig) -> go.Figure:
+    """Builds the Plotly figure for one plot of the dashboard."""
+    config = config_model.model_dump()
+    if config["plot_type"] == "invalid":
+        return invalid_figure()
+    x, y, plot_type, series_by, series_values = (
+        config["x_axis"],
+        config["y_axis"],
+        config["plot_type"],
+        config["series_by"],
+        config["series_values"],
+    )
+    color = series_by if series_values else None
+    filters = (
+        config["variable_group"],
+        config["subgroup"],
+        config["variable"],
+        series_by,
+        series_values,
+    )
+    columns = dataset.frame.columns
+    if x not in columns or y not in columns:
+        return go.Figure()
+    hover_cols = [col for col in ["Year", "Area", "Unit"] if col in columns]
+    group_cols = [x] + ([color] if color else [])
+    webgl = False
+    try:
+        if plot_type in ("stacked bar", "multi bar") and y == "Value":
+            with span("aggregate"):
+                df_plot = dataset.cube.aggregate(group_cols, hover_cols, *filters)
+        else:
+            cols_to_keep = list(set([x, y] + hover_cols + group_cols))
+            with span("filter"):
+                df_filtered = dataset.filter_index.select(*filters)
+                df_plot = df_filtered[cols_to_keep].dropna(subset=[x, y])
+            if plot_type in ("stacked bar", "multi bar"):
+                agg_spec = {y: "mean"}
+                for col in hover_cols:
+                    if col not in group_cols:
+                        agg_spec[col] = "first"
+                with span("aggregate"):
+                    df_plot = df_plot.groupby(
+                        group_cols, as_index=False, observed=True
+                    ).agg(agg_spec)
+            else:
+                webgl = use_webgl(plot_type, len(df_plot))
+                with span("sample"):
+                    df_plot = downsample(
+                        df_plot, x, y, color, plot_type, point_budget(webgl)
+                    )
+                    if plot_type == "line":
+                        df_plot = df_plot.sort_values(by=x)
+        if df_plot.empty:
+            return go.Figure()
+        with span("plotly"):
+            fig = trace_figure(df_plot, x, y, color, hover_cols, plot_type, webgl)
+    except Exception as e:
+        logging.exception(f"Error creating plot: {e}")
+        fig = None
+    if fig:
+        with span("unit"):
+            unit = ""
+            if "Unit" in df_plot.columns and pd.notna(df_plot["Unit"].iloc[0]):
+                unit = str(df_plot["Unit"].iloc[0])
+        y_axis_title = unit if unit else y.replace("_", " ").title()
+        with span("update_layout"):
+            fig.update_layout(
+                paper_bgcolor="rgba(0,0,0,0)",
+                plot_bgcolor="rgba(0,0,0,0)",
+                font={"color": "#6B7280", "family": "Inter"},
+                xaxis={"gridcolor": "#E5E7EB"},
+                yaxis={"gridcolor": "#E5E7EB", "title": y_axis_title},
+                margin=dict(l=20, r=20, t=20, b=20),
+            )
+    else:
+        fig = go.Figure()
+    return fig
+
+
+def config_hash(config_model: PlotConfig) -> str:
+    """Hashes everything in a PlotConfig that affects its figure.
+
+    The plot id is left out, so identical plots in different slices or
+    sessions share one cache entry.
+    """
+    config = config_model.model_dump(exclude={"id"})
+    canonical = json.dumps(config, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(canonical.encode()).hexdigest()
+
+
+class FigureCache:
+    """LRU cache of serialized figures bounded by entry count and bytes.
+
+    Figures are kept as the Plotly JSON that is pushed to the browser and
+    keyed by (dataset fingerprint, PlotConfig hash), so a hit costs neither
+    a build nor a serialization. Entries are shared between sessions.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[tuple[str, str], str] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple[str, str]) -> str | None:
+        with self._lock:
+            figure_json = self._entries.get(key)
+            if figure_json is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return figure_json
+
+    def put(self, key: tuple[str, str], figure_json: str):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old)
+            self._entries[key] = figure_json
+            self._bytes += len(figure_json)
+            while self._entries and (
+                len(self._entries) > self.max_entries or self._bytes > self.max_bytes
+            ):
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+            }
+
+
+figure_cache = FigureCache(FIGURE_CACHE_MAX_ENTRIES, FIGURE_CACHE_MAX_BYTES)
+
+
+def get_figure_json(dataset: Dataset, config_model: PlotConfig) -> str:
+    """Returns the serialized figure for a plot, building it on a cache miss."""
+    key = (dataset.key, config_hash(config_model))
+    figure_json = figure_cache.get(key)
+    if figure_json is None:
+        fig = build_figure(dataset, config_model)
+        # rx.plotly merges the Plotly template into the layout on the
+        # client, so shipping it with every figure only bloats the push.
+        fig.layout.template = go.layout.Template()
+        with span("serialize", plot_id=config_model.id):
+            figure_json = fig.to_json()
+        figure_cache.put(key, figure_json)
+    return figure_json
+
+
+def figure_key(dataset: Dataset, config_model: PlotConfig) -> str:
+    """Identifies the figure a plot currently renders to."""
+    return f"{dataset.key}:{config_hash(config_model)}"
+
+
+def figure_unchanged(
+    dataset: Dataset, config_model: PlotConfig, previous_key: str | None
+) -> bool:
+    """Whether a plot last rendered as ``previous_key`` looks the same now.
+
+    That is the case when ``dataset`` was merged from the dataset of
+    ``previous_key`` and no row the update replaced or added passes the
+    plot's filters. The cached figure is then shared under the new key.
+    """
+    update = dataset.update
+    if update is None:
+        return False
+    digest = config_hash(config_model)
+    if previous_key != f"{update.base_key}:{digest}":
+        return False
+    touched = update.changes.select(
+        config_model.variable_group,
+        config_model.subgroup,
+        config_model.variable,
+        config_model.series_by,
+        config_model.series_values,
+    )
+    if not touched.empty:
+        return False
+    figure_json = figure_cache.get((update.base_key, digest))
+    if figure_json is not None:
+        figure_cache.put((dataset.key, digest), figure_json)
+    return True
+
+
+_figure_pool = ThreadPoolExecutor(
+    max_workers=FIGURE_WORKERS, thread_name_prefix="figure"
+)
+
+
+def _get_figure_or_invalid(dataset: Dataset, config_model: PlotConfig) -> str:
+    with span("plot", plot_id=config_model.id, plot_type=config_model.plot_type) as s:
+        try:
+            figure_json = get_figure_json(dataset, config_model)
+        except Exception as e:
+            logging.exception(f"Error creating plot {config_model.id}: {e}")
+            figure_json = invalid_figure().to_json()
+    log_if_slow(s)
+    return figure_json
+
+
+async def build_figures(dataset: Dataset, config_models: list[PlotConfig]) -> list[str]:
+    """Builds and serializes figures on the figure worker pool.
+
+    Both steps stay off the event loop. Results are the Plotly JSON of each
+    figure in the order of ``config_models``; a plot that fails to build
+    is rendered as the "Invalid Plot" figure. Each build runs in a copy of
+    the caller's context, so its spans nest under the caller's.
+    """
+    loop = asyncio.get_running_loop()
+    return await asyncio.gather(
+        *(
+            loop.run_in_executor(
+                _figure_pool,
+                contextvars.copy_context().run,
+                _get_figure_or_invalid,
+                dataset,
+                c,
+            )
+            for c in config_models
+        )
+    )
\ No newline at end of file
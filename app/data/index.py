@@ -0,0 +1,159 @@
+import threading
+import numpy as np
+import pandas as pd
+
+
+class HierarchyIndex:
+    """VariableGroup → Subgroup → Variable lookups, built once per dataset.
+
+    Every list is pre-sorted and already prefixed with "All", so the
+    dropdown cascade in the chart modal is a pair of dictionary lookups.
+    Lookups return copies because state vars may mutate them in place.
+    """
+
+    def __init__(self, frame: pd.DataFrame):
+        self._build(self._frame_triples(frame))
+
+    @staticmethod
+    def _frame_triples(frame: pd.DataFrame) -> list[tuple[str, str, str]]:
+        triples = (
+            frame.groupby(["VariableGroup", "Subgroup", "Variable"], observed=True)
+            .size()
+            .index
+        )
+        return [(str(g), str(s), str(v)) for g, s, v in triples]
+
+    def _triples(self) -> list[tuple[str, str, str]]:
+        return [
+            (group, subgroup, variable)
+            for (group, subgroup), variables in self._variables.items()
+            if group != "All" and subgroup != "All"
+            for variable in variables[1:]
+        ]
+
+    def _build(self, triples: list[tuple[str, str, str]]):
+        subgroups: dict[str, set[str]] = {"All": set()}
+        variables: dict[tuple[str, str], set[str]] = {("All", "All"): set()}
+        for group, subgroup, variable in triples:
+            for g in (group, "All"):
+                subgroups.setdefault(g, set()).add(subgroup)
+                for s in (subgroup, "All"):
+                    variables.setdefault((g, s), set()).add(variable)
+        self.variable_groups = ["All"] + sorted(g for g in subgroups if g != "All")
+        self._subgroups = {g: ["All"] + sorted(s) for g, s in subgroups.items()}
+        self._variables = {k: ["All"] + sorted(v) for k, v in variables.items()}
+
+    def merged(self, frame: pd.DataFrame) -> "HierarchyIndex":
+        """This hierarchy extended with the triples present in ``frame``."""
+        merged = HierarchyIndex.__new__(HierarchyIndex)
+        merged._build(self._triples() + self._frame_triples(frame))
+        return merged
+
+    def subgroups(self, variable_group: str) -> list[str]:
+        return list(self._subgroups.get(variable_group, ["All"]))
+
+    def variables(self, variable_group: str, subgroup: str) -> list[str]:
+        return list(self._variables.get((variable_group, subgroup), ["All"]))
+
+
+class FilterIndex:
+    """Row positions for every value of a dimension column.
+
+    Positions come from ``groupby(...).indices`` and are built lazily, once
+    per column and dataset. A filter is answered by intersecting the
+    sorted position arrays of its clauses, so the shared frame is never
+    masked or copied in full.
+    """
+
+    def __init__(self, frame: pd.DataFrame):
+        self.frame = frame
+        self._positions: dict[str, dict[str, np.ndarray]] = {}
+        self._lock = threading.Lock()
+
+    def _column_positions(self, column: str) -> dict[str, np.ndarray]:
+        positions = self._positions.get(column)
+        if positions is None:
+            with self._lock:
+                positions = self._positions.get(column)
+                if positions is None:
+                    groups = self.frame.groupby(column, observed=True, sort=False)
+                    positions = {str(k): v for k, v in groups.indices.items()}
+                    self._positions[column] = positions
+        return positions
+
+    def merged(
+        self, frame: pd.DataFrame, kept: np.ndarray, appended: "FilterIndex"
+    ) -> "FilterIndex":
+        """The index of ``frame``: the ``kept`` rows of ours, then ``appended``'s.
+
+        Positions already built here are renumbered and extended instead of
+        being regrouped from ``frame``; other columns stay lazy.
+        """
+        merged = FilterIndex(frame)
+        renumbered = np.cumsum(kept) - 1
+        offset = len(frame) - len(appended.frame)
+        with self._lock:
+            built = dict(self._positions)
+        for column, positions in built.items():
+            column_positions = {}
+            for value, rows in positions.items():
+                rows = renumbered[rows[kept[rows]]]
+                if len(rows):
+                    column_positions[value] = rows
+            for value, rows in appended._column_positions(column).items():
+                rows = rows + offset
+                head = column_positions.get(value)
+                if head is not None:
+                    rows = np.concatenate([head, rows])
+                column_positions[value] = rows
+            merged._positions[column] = column_positions
+        return merged
+
+    def positions(self, filters: dict[str, list[str]]) -> np.ndarray | None:
+        """Returns sorted row positions matching every clause, or None for all rows.
+
+        Each clause maps a column to the values it may take; values are
+        matched by their string form, as they appear in the UI.
+        """
+        selected = []
+        for column, values in filters.items():
+            if column not in self.frame.columns:
+                return np.empty(0, dtype=np.intp)
+            column_positions = self._column_positions(column)
+            parts = [column_positions[v] for v in values if v in column_positions]
+            if not parts:
+                return np.empty(0, dtype=np.intp)
+            if len(parts) == 1:
+                selected.append(parts[0])
+            else:
+                selected.append(np.sort(np.concatenate(parts)))
+        if not selected:
+            return None
+        selected.sort(key=len)
+        result = selected[0]
+        for other in selected[1:]:
+            result = np.intersect1d(result, other, assume_unique=True)
+        return result
+
+    def select(
+        self,
+        variable_group: str = "All",
+        subgroup: str = "All",
+        variable: str = "All",
+        series_by: str = "",
+        series_values: list[str] | None = None,
+    ) -> pd.DataFrame:
+        """Returns the rows selected by the chart filters of a PlotConfig."""
+        filters = {}
+        if variable_group != "All":
+            filters["VariableGroup"] = [variable_group]
+        if subgroup != "All":
+            filters["Subgroup"] = [subgroup]
+        if variable != "All":
+            filters["Variable"] = [variable]
+        if series_by and series_values:
+            filters[series_by] = [str(v) for v in series_values]
+        positions = self.positions(filters)
+        if positions is None:
+            return self.frame
+        return self.frame.take(positions)
\ No newline at end of file
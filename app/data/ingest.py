@@ -0,0 +1,288 @@
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+from pathlib import Path
+from typing import BinaryIO
+
+# Bumped whenever the in-memory representation changes, so columnar caches
+# written by an older ingest are rebuilt instead of reused.
+INGEST_VERSION = "2"
+
+CATEGORICAL_COLUMNS = [
+    "VariableGroup",
+    "Subgroup",
+    "Variable",
+    "Area",
+    "Unit",
+    "Symbol",
+]
+REQUIRED_COLUMNS = ["VariableGroup", "Subgroup", "Variable", "Year", "Value"]
+NUMERIC_COLUMNS = ["Year", "Value"]
+CSV_CHUNK_ROWS = 250_000
+_FLOAT32_CHECK_ROWS = 1_000_000
+HEADER_SAMPLE_ROWS = 1000
+
+
+def _narrow_year(year: pd.Series) -> pd.Series:
+    if year.isna().any() or not pd.api.types.is_numeric_dtype(year):
+        return year
+    if not (year == year.round()).all():
+        return year
+    return pd.to_numeric(year, downcast="integer")
+
+
+def _has_float32_digits(values: np.ndarray) -> np.ndarray:
+    """Marks values with at most ``FLT_DIG`` significant digits.
+
+    float32 keeps any decimal of that many digits, so these pass the string
+    round-trip in ``_fits_float32`` without taking it. Rounding to the
+    digits and scaling back by an exact power of ten reproduces such a
+    value exactly; anything else comes back different.
+    """
+    magnitude = np.abs(values)
+    digits = np.finfo(np.float32).precision
+    normal = (magnitude > 1e-30) & (magnitude < 1e30)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        shift = digits - 1 - np.floor(np.log10(np.where(normal, magnitude, 1.0)))
+    scale = 10.0 ** np.abs(shift)
+    rounded = np.where(
+        shift >= 0,
+        np.round(values * scale) / scale,
+        np.round(values / scale) * scale,
+    )
+    return (normal & (rounded == values)) | (values == 0) | np.isnan(values)
+
+
+def _fits_float32(values: np.ndarray) -> bool:
+    """True if every value keeps its printed decimal digits as a float32."""
+    for start in range(0, len(values), _FLOAT32_CHECK_ROWS):
+        part = values[start : start + _FLOAT32_CHECK_ROWS]
+        part = part[~_has_float32_digits(part)]
+        narrowed = part.astype(np.float32).astype(str).astype(np.float64)
+        if not np.array_equal(narrowed, part, equal_nan=True):
+            return False
+    return True
+
+
+def _narrow_value(value: pd.Series) -> pd.Series:
+    """Narrows Value to float32 when no value loses a printed digit."""
+    if not pd.api.types.is_float_dtype(value):
+        return value
+    if not _fits_float32(value.to_numpy(dtype=np.float64)):
+        return value
+    return value.astype(np.float32)
+
+
+def encode_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Converts a raw AQUASTAT frame to its compact in-memory representation.
+
+    Dimension columns become categoricals, so equality and ``isin`` filters
+    compare integer codes instead of Python strings. Year is downcast to
+    the smallest integer type and Value to float32 where that is lossless.
+    """
+    df.columns = [col.strip() for col in df.columns]
+    for col in CATEGORICAL_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype("category")
+    if "Year" in df.columns:
+        df["Year"] = _narrow_year(df["Year"])
+    if "Value" in df.columns:
+        df["Value"] = _narrow_value(df["Value"])
+    return df
+
+
+def _widen_float32(values: pd.Series) -> pd.Series:
+    """Converts float32 to the float64 of its printed digits, unlike astype."""
+    if values.dtype != np.float32:
+        return values
+    return pd.Series(values.to_numpy().astype(str).astype(np.float64))
+
+
+def concat_frames(head: pd.DataFrame, tail: pd.DataFrame) -> pd.DataFrame:
+    """Stacks two compact frames with the same columns, keeping them compact.
+
+    Categoricals are merged onto the union of both category lists, sorted
+    as in ``encode_frame``. Other columns take the wider of the two dtypes,
+    so a float32 Value stays float32 unless either side needed float64.
+    """
+    data = {}
+    for col in head.columns:
+        first, second = head[col], tail[col]
+        if isinstance(first.dtype, pd.CategoricalDtype) and isinstance(
+            second.dtype, pd.CategoricalDtype
+        ):
+            data[col] = union_categoricals(
+                [first, second], sort_categories=True, ignore_order=True
+            )
+        else:
+            if {first.dtype, second.dtype} == {
+                np.dtype(np.float32),
+                np.dtype(np.float64),
+            }:
+                first, second = _widen_float32(first), _widen_float32(second)
+            data[col] = pd.concat([first, second], ignore_index=True)
+    return pd.DataFrame(data, columns=head.columns)
+
+
+class SchemaError(ValueError):
+    """Raised when a CSV is not an AQUASTAT export the dashboard can plot."""
+
+
+@dataclass(frozen=True)
+class IngestProgress:
+    bytes_read: int
+    total_bytes: int
+    rows: int
+    elapsed: float
+
+    @property
+    def eta_seconds(self) -> float | None:
+        """Remaining parse time, extrapolated from the bytes read so far."""
+        if not self.bytes_read or self.bytes_read >= self.total_bytes:
+            return None
+        return self.elapsed * (self.total_bytes - self.bytes_read) / self.bytes_read
+
+    def describe(self) -> str:
+        mb_read = self.bytes_read / 1024 / 1024
+        mb_total = self.total_bytes / 1024 / 1024
+        message = f"Parsed {self.rows:,} rows ({mb_read:,.1f} of {mb_total:,.1f} MB)"
+        if self.eta_seconds is not None:
+            message += f", about {self.eta_seconds:,.0f} s left"
+        return message
+
+
+def check_columns(columns: list[str]):
+    """Fails fast on a header that lacks a column the dashboard needs."""
+    missing = [col for col in REQUIRED_COLUMNS if col not in columns]
+    if missing:
+        raise SchemaError(f"Missing required columns: {', '.join(missing)}")
+
+
+def check_types(chunk: pd.DataFrame):
+    """Fails fast on a first chunk whose Year or Value is not numeric."""
+    not_numeric = [
+        col for col in NUMERIC_COLUMNS if not pd.api.types.is_numeric_dtype(chunk[col])
+    ]
+    if not_numeric:
+        raise SchemaError(f"Columns are not numeric: {', '.join(not_numeric)}")
+
+
+def check_header(f: BinaryIO, rows: int = HEADER_SAMPLE_ROWS):
+    """Checks the header and first rows of an upload before it is stored.
+
+    Only the first ``rows`` rows of ``f`` are parsed and its position is
+    restored, so a file that ``read_csv`` would reject for its columns or
+    types fails at once instead of after queueing for an ingest slot.
+    """
+    position = f.tell()
+    try:
+        head = pd.read_csv(f, nrows=rows)
+    finally:
+        f.seek(position)
+    head.columns = [col.strip() for col in head.columns]
+    check_columns(list(head.columns))
+    if not head.empty:
+        check_types(head)
+
+
+class _CategoryEncoder:
+    """Accumulates one categorical column across CSV chunks.
+
+    Each chunk's codes are remapped onto a growing, process-wide category
+    list, so only small integer codes are kept between chunks.
+    """
+
+    def __init__(self):
+        self._categories: dict[str, int] = {}
+        self._codes: list[np.ndarray] = []
+
+    def add(self, values: pd.Series):
+        chunk = pd.Categorical(values)
+        mapping = np.array(
+            [
+                self._categories.setdefault(v, len(self._categories))
+                for v in chunk.categories
+            ],
+            dtype=np.int32,
+        )
+        codes = chunk.codes.astype(np.int32)
+        known = codes >= 0
+        codes[known] = mapping[codes[known]]
+        self._codes.append(codes)
+
+    def finish(self) -> pd.Categorical:
+        """Returns the column with lexically sorted categories, like astype("category")."""
+        categories = np.array(list(self._categories), dtype=object)
+        order = np.argsort(categories, kind="stable")
+        rank = np.empty(len(order), dtype=np.int32)
+        rank[order] = np.arange(len(order), dtype=np.int32)
+        codes = np.concatenate(self._codes) if self._codes else np.empty(0, np.int32)
+        known = codes >= 0
+        codes[known] = rank[codes[known]]
+        return pd.Categorical.from_codes(codes, categories=categories[order])
+
+
+def read_csv(
+    path: Path,
+    chunk_rows: int = CSV_CHUNK_ROWS,
+    progress: Callable[[IngestProgress], None] | None = None,
+) -> pd.DataFrame:
+    """Parses an AQUASTAT CSV export into its compact representation.
+
+    The file is read ``chunk_rows`` at a time and each chunk is encoded
+    before the next is parsed, so peak memory is one raw text chunk plus
+    the compact columns rather than the whole file as Python strings.
+    The header and the first chunk are checked before the rest is parsed,
+    and ``progress`` is called after every chunk.
+    """
+    started = time.monotonic()
+    total_bytes = path.stat().st_size
+    raw_columns = pd.read_csv(path, nrows=0).columns
+    columns = [col.strip() for col in raw_columns]
+    check_columns(columns)
+    dtype = {
+        raw: str for raw, col in zip(raw_columns, columns) if col in CATEGORICAL_COLUMNS
+    }
+    encoders = {
+        col: _CategoryEncoder() for col in columns if col in CATEGORICAL_COLUMNS
+    }
+    parts: dict[str, list[pd.Series]] = {
+        col: [] for col in columns if col not in encoders
+    }
+    value_fits_float32 = True
+    rows = 0
+    with path.open("rb") as f:
+        for chunk in pd.read_csv(f, chunksize=chunk_rows, dtype=dtype):
+            chunk.columns = columns
+            if not rows:
+                check_types(chunk)
+            for col, encoder in encoders.items():
+                encoder.add(chunk[col])
+            for col, chunk_parts in parts.items():
+                chunk_parts.append(chunk[col])
+            if "Value" in parts and pd.api.types.is_float_dtype(chunk["Value"]):
+                value_fits_float32 = value_fits_float32 and _fits_float32(
+                    chunk["Value"].to_numpy(dtype=np.float64)
+                )
+            rows += len(chunk)
+            if progress is not None:
+                elapsed = time.monotonic() - started
+                progress(IngestProgress(f.tell(), total_bytes, rows, elapsed))
+    if not rows:
+        raise SchemaError("The file has no data rows")
+    data = {}
+    for col in columns:
+        if col in encoders:
+            data[col] = encoders[col].finish()
+        else:
+            data[col] = pd.concat(parts.pop(col), ignore_index=True)
+    df = pd.DataFrame(data, columns=columns)
+    if "Year" in df.columns:
+        df["Year"] = _narrow_year(df["Year"])
+    if "Value" in df.columns and value_fits_float32:
+        if pd.api.types.is_float_dtype(df["Value"]):
+            df["Value"] = df["Value"].astype(np.float32)
+    return df
\ No newline at end of file
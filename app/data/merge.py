@@ -0,0 +1,120 @@
+import hashlib
+from collections.abc import Callable
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from app.data.cube import CUBE_KEYS, AggregateCube
+from app.data.index import FilterIndex
+from app.data.ingest import IngestProgress, SchemaError, concat_frames, read_csv
+from app.data.registry import Dataset, DatasetUpdate, add_dataset, get_dataset
+from app.data.storage import load_dataset
+from app.tracing import span
+
+# An update row replaces every existing row with the same values here.
+MERGE_KEYS = ["Variable", "Area", "Year"]
+
+
+def merged_key(base_key: str, update_key: str) -> str:
+    """Key of the dataset that results from merging an update into a base."""
+    return hashlib.sha256(f"{base_key}+{update_key}".encode()).hexdigest()
+
+
+def _codes(column: pd.Series, values: pd.Index) -> np.ndarray:
+    """Position of each row's value in ``values``, -1 where it is missing."""
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        lookup = values.get_indexer(column.cat.categories)
+        codes = column.cat.codes.to_numpy()
+        return np.where(codes >= 0, lookup[codes], -1)
+    return values.get_indexer(column)
+
+
+def _replaced(frame: pd.DataFrame, update: pd.DataFrame) -> np.ndarray:
+    """Marks the rows of ``frame`` whose merge key also occurs in ``update``.
+
+    Keys are numbered by the distinct values of the update alone, which is
+    small, so the full frame is only scanned with integer lookups.
+    """
+    keys = [col for col in MERGE_KEYS if col in frame.columns]
+    frame_key = np.zeros(len(frame), dtype=np.int64)
+    update_key = np.zeros(len(update), dtype=np.int64)
+    frame_valid = np.ones(len(frame), dtype=bool)
+    update_valid = np.ones(len(update), dtype=bool)
+    for col in keys:
+        values = pd.Index(pd.unique(update[col].dropna().to_numpy()))
+        frame_codes = _codes(frame[col], values)
+        update_codes = _codes(update[col], values)
+        frame_valid &= frame_codes >= 0
+        update_valid &= update_codes >= 0
+        frame_key = frame_key * len(values) + frame_codes
+        update_key = update_key * len(values) + update_codes
+    return frame_valid & np.isin(frame_key, update_key[update_valid])
+
+
+def merge_frame(base: Dataset, update_key: str, update: pd.DataFrame) -> Dataset:
+    """Merges an update into ``base``, returning an unregistered dataset.
+
+    Rows of ``base`` whose (Variable, Area, Year) occurs in the update are
+    dropped and the update's rows are appended. Indexes ``base`` already
+    built are carried over incrementally; the others stay lazy.
+    """
+    if sorted(update.columns) != sorted(base.frame.columns):
+        raise SchemaError("The update's columns do not match the loaded dataset")
+    update = update[base.frame.columns]
+    replaced = _replaced(base.frame, update)
+    kept = ~replaced
+    with span("concat"):
+        frame = concat_frames(base.frame[kept], update)
+    dims = [col for col in CUBE_KEYS if col in frame.columns]
+    changes = concat_frames(base.frame.loc[replaced, dims], update[dims])
+    dataset = Dataset(
+        merged_key(base.key, update_key),
+        frame,
+        sources=(*base.sources, update_key),
+        update=DatasetUpdate(
+            base_key=base.key,
+            replaced_rows=int(replaced.sum()),
+            added_rows=len(update),
+            changes=FilterIndex(changes),
+        ),
+    )
+    # Only indexes that are already built are worth updating; cached
+    # properties live in the instance __dict__.
+    built = vars(base)
+    with span("indexes"):
+        if "hierarchy" in built:
+            dataset.hierarchy = base.hierarchy.merged(update)
+        if "filter_index" in built:
+            dataset.filter_index = base.filter_index.merged(
+                frame, kept, FilterIndex(update)
+            )
+        if "cube" in built:
+            delta = AggregateCube(update)
+            dataset.cube = base.cube.merged(_replaced(base.cube.frame, update), delta)
+    return dataset
+
+
+def apply_update(
+    base: Dataset,
+    path: Path,
+    key: str,
+    progress: Callable[[IngestProgress], None] | None = None,
+) -> Dataset:
+    """Returns the shared dataset for ``base`` with the update at ``path`` merged in.
+
+    ``key`` is the content hash of the update file. A merge another
+    session already made is reused from the registry.
+    """
+    dataset = get_dataset(merged_key(base.key, key))
+    if dataset is not None:
+        return dataset
+    with span("parse_csv"):
+        update = read_csv(path, progress=progress)
+    return add_dataset(merge_frame(base, key, update))
+
+
+def load_with_updates(path: Path, updates: list[tuple[Path, str]]) -> Dataset:
+    """Loads an upload and merges its ``(path, key)`` updates in order."""
+    dataset = load_dataset(path)
+    for update_path, update_key in updates:
+        dataset = apply_update(dataset, update_path, update_key)
+    return dataset
\ No newline at end of file
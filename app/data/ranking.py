@@ -0,0 +1,106 @@
+import threading
+from collections import OrderedDict
+from app.data.cube import CUBE_KEYS
+from app.data.registry import Dataset
+
+RANKING_CACHE_MAX_ENTRIES = 1024
+SEARCH_CACHE_MAX_ENTRIES = 64
+
+
+class SeriesRanking:
+    """Ordered series values for one filter, with a substring search.
+
+    Lowercase keys are computed once per ranking. Search results are kept
+    per query, and a query that extends a cached one, as when typing, only
+    scans that query's matches.
+    """
+
+    def __init__(self, options: tuple[str, ...]):
+        self.options = options
+        self._keys = tuple(option.lower() for option in options)
+        self._matches: OrderedDict[str, tuple[int, ...]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _positions(self, needle: str) -> tuple[int, ...]:
+        with self._lock:
+            positions = self._matches.get(needle)
+            if positions is not None:
+                self._matches.move_to_end(needle)
+                return positions
+            candidates = range(len(self._keys))
+            for end in range(len(needle) - 1, 0, -1):
+                narrower = self._matches.get(needle[:end])
+                if narrower is not None:
+                    candidates = narrower
+                    break
+        positions = tuple(i for i in candidates if needle in self._keys[i])
+        with self._lock:
+            self._matches[needle] = positions
+            while len(self._matches) > SEARCH_CACHE_MAX_ENTRIES:
+                self._matches.popitem(last=False)
+        return positions
+
+    def search(self, text: str) -> list[str]:
+        """Options containing ``text``, case-insensitively, in ranking order."""
+        if text.strip() == "":
+            return list(self.options)
+        return [self.options[i] for i in self._positions(text.lower())]
+
+
+EMPTY_RANKING = SeriesRanking(())
+
+_rankings: OrderedDict[tuple[str, str, str, str, str], SeriesRanking] = OrderedDict()
+_lock = threading.Lock()
+
+
+def _compute_ranking(
+    dataset: Dataset,
+    variable_group: str,
+    subgroup: str,
+    variable: str,
+    series_by: str,
+) -> tuple[str, ...]:
+    if series_by == "Area" and "Value" in dataset.frame.columns:
+        return tuple(dataset.cube.ranking("Area", variable_group, subgroup, variable))
+    # The cube keeps every (…, Area, Year) cell, including those without a
+    # Value, so its distinct values match those of the filtered raw rows.
+    if series_by in CUBE_KEYS:
+        df = dataset.cube.index.select(variable_group, subgroup, variable)
+    else:
+        df = dataset.filter_index.select(variable_group, subgroup, variable)
+    if series_by not in df.columns:
+        return ()
+    unique_values = df[series_by].unique()
+    try:
+        return tuple(str(v) for v in sorted(unique_values, key=float, reverse=True))
+    except (ValueError, TypeError):
+        return tuple(str(v) for v in sorted(unique_values))
+
+
+def series_ranking(
+    dataset: Dataset,
+    variable_group: str,
+    subgroup: str,
+    variable: str,
+    series_by: str,
+) -> SeriesRanking:
+    """Series values in the order the chart modal lists them.
+
+    Areas are ranked by descending mean Value, anything else is sorted
+    numerically where possible. Rankings are memoized per dataset and
+    filter, so Top N picks and the series filter box reuse them.
+    """
+    key = (dataset.key, variable_group, subgroup, variable, series_by)
+    with _lock:
+        ranking = _rankings.get(key)
+        if ranking is not None:
+            _rankings.move_to_end(key)
+            return ranking
+    ranking = SeriesRanking(
+        _compute_ranking(dataset, variable_group, subgroup, variable, series_by)
+    )
+    with _lock:
+        _rankings[key] = ranking
+        while len(_rankings) > RANKING_CACHE_MAX_ENTRIES:
+            _rankings.popitem(last=False)
+    return ranking
\ No newline at end of file
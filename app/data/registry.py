@@ -0,0 +1,128 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import cached_property
+from pathlib import Path
+import pandas as pd
+from app.data.cube import AggregateCube
+from app.data.index import FilterIndex, HierarchyIndex
+
+# Registered frames are shared by every session on the worker. Copy-on-write
+# guarantees that a filtered view modified in one session never writes back
+# into the frame the other sessions are reading.
+pd.set_option("mode.copy_on_write", True)
+
+MAX_DATASETS = 8
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+@dataclass(frozen=True)
+class DatasetUpdate:
+    """How a merged dataset differs from the dataset it was merged into.
+
+    ``changes`` indexes the dimension columns of every row the update
+    touched: the rows it replaced and the rows it brought in.
+    """
+
+    base_key: str
+    replaced_rows: int
+    added_rows: int
+    changes: FilterIndex
+
+
+class Dataset:
+    """A read-only AQUASTAT frame shared by all sessions that loaded the same file.
+
+    ``sources`` are the content hashes of the uploads the frame was built
+    from: the file itself, or a base file followed by its merged updates.
+    """
+
+    def __init__(
+        self,
+        key: str,
+        frame: pd.DataFrame,
+        sources: tuple[str, ...] | None = None,
+        update: DatasetUpdate | None = None,
+    ):
+        self.key = key
+        self.frame = frame
+        self.sources = sources or (key,)
+        self.update = update
+
+    @cached_property
+    def hierarchy(self) -> HierarchyIndex:
+        return HierarchyIndex(self.frame)
+
+    @cached_property
+    def filter_index(self) -> FilterIndex:
+        return FilterIndex(self.frame)
+
+    @cached_property
+    def cube(self) -> AggregateCube:
+        return AggregateCube(self.frame)
+
+
+_datasets: OrderedDict[str, Dataset] = OrderedDict()
+_lock = threading.Lock()
+
+
+def file_hash(path: Path) -> str:
+    """Returns the sha256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def get_dataset(key: str) -> Dataset | None:
+    """Looks up a registered dataset, marking it as recently used."""
+    if not key:
+        return None
+    with _lock:
+        dataset = _datasets.get(key)
+        if dataset is not None:
+            _datasets.move_to_end(key)
+        return dataset
+
+
+def add_dataset(dataset: Dataset) -> Dataset:
+    """Registers a dataset under its key.
+
+    If another session already registered the same key, the existing
+    dataset is returned and ``dataset`` is discarded so only one copy stays
+    resident.
+    """
+    with _lock:
+        existing = _datasets.get(dataset.key)
+        if existing is None:
+            _datasets[dataset.key] = existing = dataset
+            while len(_datasets) > MAX_DATASETS:
+                _datasets.popitem(last=False)
+        _datasets.move_to_end(dataset.key)
+        return existing
+
+
+def evict_least_recent() -> bool:
+    """Drops the least recently used dataset from the registry.
+
+    Sessions still holding its key reload it on their next access. Returns
+    False if the registry was already empty.
+    """
+    with _lock:
+        if not _datasets:
+            return False
+        _datasets.popitem(last=False)
+        return True
+
+
+def register_dataset(key: str, frame: pd.DataFrame) -> Dataset:
+    """Registers a frame under its content hash."""
+    return add_dataset(Dataset(key, frame))
+
+
+def registered_keys() -> list[str]:
+    """Content hashes of the uploads behind the datasets resident in this process."""
+    with _lock:
+        return list(dict.fromkeys(k for d in _datasets.values() for k in d.sources))
\ No newline at end of file
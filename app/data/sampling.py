@@ -0,0 +1,154 @@
+import os
+import numpy as np
+import pandas as pd
+
+MAX_PLOT_POINTS = int(os.environ.get("DATAVIZ_MAX_PLOT_POINTS", 5000))
+# Scatter and line plots with more points than this are drawn with WebGL,
+# which stays responsive with far more points than SVG and so gets the
+# larger sampling budget. It is never below MAX_PLOT_POINTS; raising it
+# above keeps plots of up to this many points in SVG, sampled to
+# MAX_PLOT_POINTS.
+WEBGL_THRESHOLD = max(
+    MAX_PLOT_POINTS,
+    int(os.environ.get("DATAVIZ_WEBGL_THRESHOLD", MAX_PLOT_POINTS)),
+)
+# Every point still travels to the browser as JSON, roughly 30 bytes each,
+# so this caps a WebGL figure at about 1.5 MB per push.
+MAX_WEBGL_POINTS = int(os.environ.get("DATAVIZ_MAX_WEBGL_POINTS", 50_000))
+# Line plots sampled to more points than this use the vectorised min-max
+# buckets instead of LTTB, whose bucket loop runs in Python.
+LTTB_MAX_POINTS = int(os.environ.get("DATAVIZ_LTTB_MAX_POINTS", 5000))
+WEBGL_PLOT_TYPES = ("scatter", "line")
+
+
+def use_webgl(plot_type: str, n_points: int) -> bool:
+    """Whether a plot of ``n_points`` rows is drawn with WebGL traces."""
+    return plot_type in WEBGL_PLOT_TYPES and n_points > WEBGL_THRESHOLD
+
+
+def point_budget(webgl: bool) -> int:
+    """Most points a scatter or line plot is sampled down to.
+
+    With the default WEBGL_THRESHOLD an SVG plot already fits in
+    MAX_PLOT_POINTS, so only WebGL plots are ever sampled.
+    """
+    return MAX_WEBGL_POINTS if webgl else MAX_PLOT_POINTS
+
+
+def _allocate(sizes: np.ndarray, budget: int) -> np.ndarray:
+    """Splits a point budget evenly across series, passing on unused shares.
+
+    Series smaller than their share keep all their points and the rest of
+    their share goes to the larger series.
+    """
+    quotas = np.zeros(len(sizes), dtype=np.int64)
+    remaining = budget
+    for left, i in enumerate(np.argsort(sizes, kind="stable")):
+        share = remaining // (len(sizes) - left)
+        quotas[i] = min(sizes[i], share)
+        remaining -= quotas[i]
+    return quotas
+
+
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets: picks ``n_out`` visually salient points.
+
+    ``x`` must be sorted. Returns positions into ``x``/``y``; the first and
+    last points are always kept, so peaks and the series extent survive.
+    """
+    n = len(x)
+    if n_out >= n:
+        return np.arange(n)
+    if n_out < 3:
+        return np.array([0, n - 1][:n_out], dtype=np.int64)
+    x = x.astype(np.float64)
+    y = y.astype(np.float64)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[end:next_end].mean() if next_end > end else x[-1]
+        avg_y = y[end:next_end].mean() if next_end > end else y[-1]
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def minmax(y: np.ndarray, n_out: int) -> np.ndarray:
+    """Keeps the lowest and highest point of each bucket, about ``n_out`` in all.
+
+    Returns sorted positions into ``y``; the first and last points are
+    always kept. Unlike ``lttb`` every bucket is handled in one pass of
+    numpy reductions, so it stays fast for budgets of many thousand points.
+    """
+    n = len(y)
+    if n_out >= n:
+        return np.arange(n)
+    n_buckets = (n_out - 2) // 2
+    if n_buckets < 1:
+        return np.array([0, n - 1][:n_out], dtype=np.int64)
+    inner = y[1 : n - 1].astype(np.float64)
+    edges = np.linspace(0, len(inner), n_buckets + 1).astype(np.int64)
+    bucket = np.repeat(np.arange(n_buckets), np.diff(edges))
+    picks = [np.array([0, n - 1])]
+    for extreme in (np.fmin, np.fmax):
+        # The first point of each bucket that equals the bucket's extreme.
+        hits = np.flatnonzero(inner == extreme.reduceat(inner, edges[:-1])[bucket])
+        _, first = np.unique(bucket[hits], return_index=True)
+        picks.append(hits[first] + 1)
+    return np.unique(np.concatenate(picks))
+
+
+def _series_positions(df: pd.DataFrame, color: str | None) -> list[np.ndarray]:
+    if not color:
+        return [np.arange(len(df))]
+    return list(df.groupby(color, observed=True, sort=False).indices.values())
+
+
+def downsample(
+    df: pd.DataFrame,
+    x: str,
+    y: str,
+    color: str | None,
+    plot_type: str,
+    max_points: int = MAX_PLOT_POINTS,
+) -> pd.DataFrame:
+    """Reduces ``df`` to at most ``max_points`` rows without dropping a series.
+
+    The budget is shared across the series in ``color``. Line charts keep
+    the min-max points of each x-sorted series when ``max_points`` exceeds
+    LTTB_MAX_POINTS, as the WebGL budget does, and its LTTB points for
+    smaller budgets, i.e. SVG plots when WEBGL_THRESHOLD is raised above
+    MAX_PLOT_POINTS. Other plot types draw a reproducible random sample
+    within each series.
+    """
+    if len(df) <= max_points:
+        return df
+    series = _series_positions(df, color)
+    quotas = _allocate(np.array([len(p) for p in series]), max_points)
+    rng = np.random.default_rng(42)
+    kept = []
+    if plot_type == "line":
+        x_values = df[x]
+        if not pd.api.types.is_numeric_dtype(x_values):
+            x_values = pd.Series(pd.factorize(x_values, sort=True)[0], index=df.index)
+        xs = x_values.to_numpy()
+        ys = df[y].to_numpy()
+        for positions, quota in zip(series, quotas):
+            positions = positions[np.argsort(xs[positions], kind="stable")]
+            if max_points > LTTB_MAX_POINTS:
+                kept.append(positions[minmax(ys[positions], quota)])
+            else:
+                kept.append(positions[lttb(xs[positions], ys[positions], quota)])
+    else:
+        for positions, quota in zip(series, quotas):
+            kept.append(rng.choice(positions, size=quota, replace=False))
+    return df.take(np.sort(np.concatenate(kept)))
\ No newline at end of file
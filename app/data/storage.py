@@ -0,0 +1,104 @@
+import logging
+import os
+from collections.abc import Callable
+from pathlib import Path
+import pyarrow as pa
+import pyarrow.ipc as ipc
+from app.data.ingest import INGEST_VERSION, IngestProgress, read_csv
+from app.data.registry import Dataset, file_hash, get_dataset, register_dataset
+from app.tracing import span
+
+SIDECAR_SUFFIX = ".arrow"
+
+
+def sidecar_path(path: Path) -> Path:
+    """Returns the columnar cache file that belongs to an uploaded CSV."""
+    return path.with_name(path.name + SIDECAR_SUFFIX)
+
+
+def _source_fingerprint(path: Path) -> dict[bytes, bytes]:
+    stat = path.stat()
+    return {
+        b"source_size": str(stat.st_size).encode(),
+        b"source_mtime_ns": str(stat.st_mtime_ns).encode(),
+        b"ingest_version": INGEST_VERSION.encode(),
+    }
+
+
+def _open_sidecar(path: Path) -> ipc.RecordBatchFileReader | None:
+    """Opens the memory-mapped sidecar of ``path`` if it is still fresh."""
+    cache_path = sidecar_path(path)
+    if not cache_path.exists():
+        return None
+    try:
+        reader = ipc.open_file(pa.memory_map(str(cache_path), "r"))
+    except (OSError, pa.ArrowInvalid) as e:
+        logging.warning(f"Ignoring unreadable cache {cache_path}: {e}")
+        return None
+    metadata = reader.schema.metadata or {}
+    fingerprint = _source_fingerprint(path)
+    if any(metadata.get(k) != v for k, v in fingerprint.items()):
+        return None
+    return reader
+
+
+def write_sidecar(path: Path, dataset: Dataset):
+    """Writes the parsed frame of ``path`` as an uncompressed Arrow IPC file.
+
+    The file is written next to the CSV and atomically moved into place, so
+    a concurrent reader never maps a half-written cache.
+    """
+    table = pa.Table.from_pandas(dataset.frame, preserve_index=False)
+    metadata = {
+        **(table.schema.metadata or {}),
+        **_source_fingerprint(path),
+        b"content_hash": dataset.key.encode(),
+    }
+    table = table.replace_schema_metadata(metadata)
+    cache_path = sidecar_path(path)
+    tmp_path = cache_path.with_name(cache_path.name + ".tmp")
+    with pa.OSFile(str(tmp_path), "wb") as sink:
+        with ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, cache_path)
+
+
+def load_dataset(
+    path: Path,
+    key: str | None = None,
+    progress: Callable[[IngestProgress], None] | None = None,
+) -> Dataset:
+    """Returns the shared dataset for an uploaded CSV.
+
+    Lookup order is the process registry, then the memory-mapped columnar
+    sidecar, and only then a chunked CSV parse, after which the sidecar is
+    (re)built for the next reload. ``key`` is the content hash of the file
+    if the caller already computed it; ``progress`` receives parse updates.
+    """
+    if key is not None:
+        dataset = get_dataset(key)
+        if dataset is not None:
+            return dataset
+    reader = _open_sidecar(path)
+    if reader is not None:
+        key = reader.schema.metadata[b"content_hash"].decode()
+        dataset = get_dataset(key)
+        if dataset is not None:
+            return dataset
+        with span("read_sidecar"):
+            df = reader.read_all().to_pandas(split_blocks=True)
+        return register_dataset(key, df)
+    if key is None:
+        with span("hash"):
+            key = file_hash(path)
+    dataset = get_dataset(key)
+    if dataset is None:
+        with span("parse_csv"):
+            df = read_csv(path, progress=progress)
+        dataset = register_dataset(key, df)
+    try:
+        with span("write_sidecar"):
+            write_sidecar(path, dataset)
+    except (OSError, pa.ArrowException) as e:
+        logging.warning(f"Could not write columnar cache for {path}: {e}")
+    return dataset
\ No newline at end of file
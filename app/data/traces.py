@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from plotly.colors import qualitative
+
+# The discrete colour sequence of the default Plotly template, which is
+# what plotly express cycles through for one trace per series value.
+COLORWAY = qualitative.Plotly
+
+
+def _hovertemplate(
+    x: str, y: str, color: str | None, customdata_cols: list[str]
+) -> str:
+    """Reproduces the hover labels plotly express generates for our schema."""
+    parts = []
+    if color:
+        parts.append(f"{color}=%{{customdata[{customdata_cols.index(color)}]}}")
+    parts += [f"{x}=%{{x}}", f"{y}=%{{y}}"]
+    parts += [
+        f"{col}=%{{customdata[{i}]}}"
+        for i, col in enumerate(customdata_cols)
+        if col != color
+    ]
+    return "<br>".join(parts) + "<extra></extra>"
+
+
+def _series_groups(df: pd.DataFrame, color: str | None) -> list[tuple[str, np.ndarray]]:
+    """Splits row positions by series value, in order of first appearance."""
+    if not color:
+        return [("", np.arange(len(df)))]
+    codes, uniques = pd.factorize(df[color], sort=False)
+    order = np.argsort(codes, kind="stable")
+    bounds = np.searchsorted(codes[order], np.arange(1, len(uniques)))
+    return [
+        (str(value), positions)
+        for value, positions in zip(uniques, np.split(order, bounds))
+    ]
+
+
+def trace_figure(
+    df: pd.DataFrame,
+    x: str,
+    y: str,
+    color: str | None,
+    hover_cols: list[str],
+    plot_type: str,
+    webgl: bool = False,
+) -> go.Figure:
+    """Builds a scatter, line or bar figure straight from column arrays.
+
+    ``df`` is in the long AQUASTAT format and is expected to be sampled,
+    sorted or aggregated already. One trace is emitted per value of
+    ``color``, with the same names, colours and hover labels as the
+    plotly express figures this replaces. With ``webgl``, scatter and line
+    traces are Scattergl, as plotly express would emit with
+    ``render_mode="webgl"``.
+    """
+    scatter = go.Scattergl if webgl else go.Scatter
+    if color and color not in hover_cols:
+        hover_cols = hover_cols + [color]
+    customdata_cols = [col for col in hover_cols if col not in (x, y)]
+    xs = df[x].to_numpy()
+    ys = df[y].to_numpy()
+    customdata = np.empty((len(df), len(customdata_cols)), dtype=object)
+    for i, col in enumerate(customdata_cols):
+        customdata[:, i] = df[col].to_numpy()
+    hovertemplate = _hovertemplate(x, y, color, customdata_cols)
+    traces = []
+    for i, (name, positions) in enumerate(_series_groups(df, color)):
+        trace_color = COLORWAY[i % len(COLORWAY)]
+        common = dict(
+            x=xs[positions],
+            y=ys[positions],
+            customdata=customdata[positions],
+            hovertemplate=hovertemplate,
+            name=name,
+            legendgroup=name,
+            showlegend=bool(color),
+        )
+        if not webgl:
+            common["orientation"] = "v"
+        if plot_type == "scatter":
+            trace = scatter(
+                mode="markers",
+                marker={"color": trace_color, "symbol": "circle"},
+                **common,
+            )
+        elif plot_type == "line":
+            trace = scatter(
+                mode="lines",
+                line={"color": trace_color, "dash": "solid"},
+                marker={"symbol": "circle"},
+                **common,
+            )
+        else:
+            if plot_type == "multi bar":
+                common.update(alignmentgroup="True", offsetgroup=name)
+            trace = go.Bar(
+                marker={"color": trace_color, "pattern": {"shape": ""}},
+                textposition="auto",
+                **common,
+            )
+        traces.append(trace)
+    layout = {
+        "xaxis": {"title": {"text": x}},
+        "yaxis": {"title": {"text": y}},
+        "legend": {"tracegroupgap": 0},
+    }
+    if color:
+        layout["legend"]["title"] = {"text": color}
+    if plot_type in ("stacked bar", "multi bar"):
+        layout["barmode"] = "group" if plot_type == "multi bar" else "stack"
+    return go.Figure(data=traces, layout=layout)
\ No newline at end of file
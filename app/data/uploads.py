@@ -0,0 +1,154 @@
+import asyncio
+import hashlib
+import logging
+import os
+import time
+import uuid
+from pathlib import Path
+import reflex as rx
+from app.data.registry import registered_keys
+from app.data.storage import SIDECAR_SUFFIX, sidecar_path
+
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+UPLOAD_SUFFIX = ".csv"
+UPLOAD_MAX_AGE = float(os.environ.get("DATAVIZ_UPLOAD_MAX_AGE_DAYS", 30)) * 86400
+UPLOAD_MAX_BYTES = int(os.environ.get("DATAVIZ_UPLOAD_MAX_BYTES", 10 * 1024**3))
+UPLOAD_GC_INTERVAL = float(os.environ.get("DATAVIZ_UPLOAD_GC_INTERVAL", 3600))
+_TMP_MAX_AGE = 86400
+
+
+def upload_name(key: str) -> str:
+    """File name under which the upload with content hash ``key`` is stored."""
+    return key + UPLOAD_SUFFIX
+
+
+def upload_key(name: str) -> str:
+    """Content hash of the upload stored under ``name``."""
+    return name.removesuffix(UPLOAD_SUFFIX)
+
+
+def mark_used(path: Path):
+    """Records a use of an upload for the collector.
+
+    Only the access time is bumped; the modification time is part of the
+    sidecar fingerprint and must stay put.
+    """
+    try:
+        os.utime(path, ns=(time.time_ns(), path.stat().st_mtime_ns))
+    except OSError as e:
+        logging.warning(f"Could not mark {path} as used: {e}")
+
+
+def upload_size(file: rx.UploadFile) -> int:
+    """The size of an upload in bytes, measuring its file if needed."""
+    if file.size is not None:
+        return file.size
+    position = file.file.tell()
+    size = file.file.seek(0, os.SEEK_END)
+    file.file.seek(position)
+    return size
+
+
+def _write_chunk(f, digest, chunk: bytes):
+    digest.update(chunk)
+    f.write(chunk)
+
+
+async def save_upload(file: rx.UploadFile, upload_dir: Path) -> str:
+    """Copies an upload into the content-addressed store and returns its hash.
+
+    The upload is copied ``UPLOAD_CHUNK_SIZE`` bytes at a time and hashed on
+    the way, off the event loop. If the same content is already stored, the
+    copy is dropped and the stored file is reused.
+
+    This does not bound the memory an upload takes: Reflex reads every
+    uploaded file into an ``io.BytesIO`` before the handler runs, so the
+    whole file is already in memory here. The chunks only keep the copy to
+    disk from doubling it.
+    """
+    digest = hashlib.sha256()
+    tmp_path = upload_dir / f".{uuid.uuid4().hex}{UPLOAD_SUFFIX}.tmp"
+    try:
+        with tmp_path.open("wb") as f:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                await asyncio.to_thread(_write_chunk, f, digest, chunk)
+        key = digest.hexdigest()
+        path = upload_dir / upload_name(key)
+        if path.exists():
+            mark_used(path)
+        else:
+            os.replace(tmp_path, path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+    return key
+
+
+def collect_uploads(
+    upload_dir: Path,
+    max_age: float = UPLOAD_MAX_AGE,
+    max_bytes: int = UPLOAD_MAX_BYTES,
+) -> list[Path]:
+    """Deletes stale uploads and their sidecars, returning what was removed.
+
+    Uploads of datasets resident in this process are never collected. Of
+    the rest, files unused for ``max_age`` seconds are removed first, then
+    the least recently used until the store fits in ``max_bytes``.
+    Abandoned temporary files and sidecars without an upload go as well.
+    """
+    now = time.time()
+    referenced = {upload_name(key) for key in registered_keys()}
+    removed = []
+    candidates = []
+    total = 0
+    for path in upload_dir.iterdir():
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        if not path.is_file():
+            continue
+        if path.name.endswith(".tmp"):
+            if now - stat.st_mtime > _TMP_MAX_AGE:
+                removed.append(path)
+            continue
+        if path.name.endswith(SIDECAR_SUFFIX):
+            source = path.with_name(path.name.removesuffix(SIDECAR_SUFFIX))
+            if not source.exists():
+                removed.append(path)
+            continue
+        size = stat.st_size
+        cache_path = sidecar_path(path)
+        if cache_path.exists():
+            size += cache_path.stat().st_size
+        total += size
+        if path.name not in referenced:
+            last_used = max(stat.st_atime, stat.st_mtime)
+            candidates.append((last_used, size, path))
+    for last_used, size, path in sorted(candidates):
+        if now - last_used <= max_age and total <= max_bytes:
+            break
+        removed += [path, sidecar_path(path)]
+        total -= size
+    collected = []
+    for path in removed:
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            continue
+        except OSError as e:
+            logging.warning(f"Could not remove stale upload {path}: {e}")
+            continue
+        collected.append(path)
+    return collected
+
+
+async def collect_uploads_periodically():
+    """Lifespan task that runs the upload collector every interval."""
+    while True:
+        try:
+            removed = await asyncio.to_thread(collect_uploads, rx.get_upload_dir())
+            if removed:
+                logging.info(f"Removed {len(removed)} stale upload files.")
+        except Exception as e:
+            logging.exception(f"Error collecting uploads: {e}")
+        await asyncio.sleep(UPLOAD_GC_INTERVAL)
\ No newline at end of file
@@ -0,0 +1,201 @@
+import bisect
+import functools
+import inspect
+import threading
+import time
+from contextlib import contextmanager
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse
+
+METRICS_ROUTE = "/metrics"
+LATENCY_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Metric families by kind of callable: (metric name prefix, help text).
+KINDS = {
+    "event": ("dataviz_event", "State event handler"),
+    "var": ("dataviz_computed_var", "Async computed var"),
+    "step": ("dataviz_step", "Internal state helper"),
+}
+
+# Figure cache statistics: stats() key -> (metric name, type, help text).
+FIGURE_CACHE_METRICS = {
+    "hits": ("dataviz_figure_cache_hits_total", "counter", "Figure cache hits."),
+    "misses": ("dataviz_figure_cache_misses_total", "counter", "Figure cache misses."),
+    "entries": ("dataviz_figure_cache_entries", "gauge", "Figures in the cache."),
+    "bytes": (
+        "dataviz_figure_cache_bytes",
+        "gauge",
+        "Estimated size of the cached figures in bytes.",
+    ),
+}
+
+
+class _Histogram:
+    """Latency buckets, total and error count for one callable."""
+
+    def __init__(self):
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.count = 0
+        self.total = 0.0
+        self.errors = 0
+
+    def observe(self, seconds: float, failed: bool):
+        i = bisect.bisect_left(LATENCY_BUCKETS, seconds)
+        if i < len(self.buckets):
+            self.buckets[i] += 1
+        self.count += 1
+        self.total += seconds
+        if failed:
+            self.errors += 1
+
+
+_histograms: dict[tuple[str, str], _Histogram] = {}
+_lock = threading.Lock()
+
+
+def observe(kind: str, name: str, seconds: float, failed: bool = False):
+    """Records one call of ``name`` that took ``seconds``."""
+    with _lock:
+        histogram = _histograms.get((kind, name))
+        if histogram is None:
+            histogram = _histograms[kind, name] = _Histogram()
+        histogram.observe(seconds, failed)
+
+
+@contextmanager
+def timer(kind: str, name: str):
+    """Times the enclosed block, counting it as an error if it raises."""
+    start = time.perf_counter()
+    failed = True
+    try:
+        yield
+        failed = False
+    finally:
+        observe(kind, name, time.perf_counter() - start, failed)
+
+
+def instrument(fn, kind: str, name: str):
+    """Wraps ``fn`` so every call is timed under ``name``.
+
+    Generators are timed from the first call until they are exhausted,
+    so a handler that yields intermediate updates is measured end to end.
+    """
+    if inspect.isasyncgenfunction(fn):
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            with timer(kind, name):
+                async for item in fn(*args, **kwargs):
+                    yield item
+
+    elif inspect.iscoroutinefunction(fn):
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            with timer(kind, name):
+                return await fn(*args, **kwargs)
+
+    elif inspect.isgeneratorfunction(fn):
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timer(kind, name):
+                return (yield from fn(*args, **kwargs))
+
+    else:
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timer(kind, name):
+                return fn(*args, **kwargs)
+
+    return wrapper
+
+
+def timed(fn):
+    """Decorator timing a state helper under its qualified name."""
+    return instrument(fn, "step", fn.__qualname__)
+
+
+def instrument_events(state_cls):
+    """Times every event handler defined on ``state_cls``.
+
+    Must run right after the class is defined, before any component takes
+    a reference to its handlers.
+    """
+    for name, handler in list(state_cls.event_handlers.items()):
+        if name == "setvar" or handler.fn is None:
+            continue
+        state_cls._add_event_handler(
+            name,
+            instrument(handler.fn, "event", f"{state_cls.__name__}.{name}"),
+        )
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render() -> str:
+    """The current metrics in the Prometheus text exposition format."""
+    with _lock:
+        snapshot = {
+            key: (list(h.buckets), h.count, h.total, h.errors)
+            for key, h in sorted(_histograms.items())
+        }
+    lines = []
+    for kind, (prefix, description) in KINDS.items():
+        series = [(name, data) for (k, name), data in snapshot.items() if k == kind]
+        if not series:
+            continue
+        lines.append(
+            f"# HELP {prefix}_duration_seconds {description} latency in seconds."
+        )
+        lines.append(f"# TYPE {prefix}_duration_seconds histogram")
+        for name, (buckets, count, total, _) in series:
+            label = f'name="{_escape(name)}"'
+            cumulative = 0
+            for bound, n in zip(LATENCY_BUCKETS, buckets):
+                cumulative += n
+                lines.append(
+                    f'{prefix}_duration_seconds_bucket{{{label},le="{bound}"}} '
+                    f"{cumulative}"
+                )
+            lines.append(
+                f'{prefix}_duration_seconds_bucket{{{label},le="+Inf"}} {count}'
+            )
+            lines.append(f"{prefix}_duration_seconds_sum{{{label}}} {total}")
+            lines.append(f"{prefix}_duration_seconds_count{{{label}}} {count}")
+        lines.append(f"# HELP {prefix}_errors_total {description} calls that raised.")
+        lines.append(f"# TYPE {prefix}_errors_total counter")
+        for name, (_, _, _, errors) in series:
+            lines.append(f'{prefix}_errors_total{{name="{_escape(name)}"}} {errors}')
+    from app.data.figures import figure_cache
+
+    for key, value in figure_cache.stats().items():
+        metric, metric_type, description = FIGURE_CACHE_METRICS[key]
+        lines.append(f"# HELP {metric} {description}")
+        lines.append(f"# TYPE {metric} {metric_type}")
+        lines.append(f"{metric} {value}")
+    return "\n".join(lines) + "\n"
+
+
+async def metrics_endpoint(request: Request) -> PlainTextResponse:
+    return PlainTextResponse(render(), media_type=CONTENT_TYPE)
\ No newline at end of file
@@ -1,20 +1,63 @@
+import asyncio
 import reflex as rx
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
 import logging
+from pathlib import Path
 from typing import Literal
 import uuid
 from pydantic import BaseModel
+from reflex.experimental.client_state import ClientStateVar, _client_state_ref
 import json
+from app.data.admission import AdmissionError, ingest_queue
+from app.data.registry import Dataset, get_dataset
+from app.data.figures import build_figures, figure_key, figure_unchanged
+from app.data.ingest import IngestProgress, check_header
+from app.data.storage import load_dataset
+from app.data.merge import apply_update, load_with_updates, merged_key
+from app.data.uploads import (
+    mark_used,
+    save_upload,
+    upload_key,
+    upload_name,
+    upload_size,
+)
+from app.metrics import instrument_events, timed, timer
+from app.tracing import span
 from app.states.slice_state import SliceState, Slice, PlotConfig
 
+PROGRESS_INTERVAL = 0.5
+
+
+# Figures live in React state on the client, keyed by plot id, so a changed
+# figure is pushed on its own instead of resending every figure of the page.
+plot_figures = ClientStateVar.create("plot_figures", default={})
+
+
+def _figure_script(plot_id: str, figure_json: str | None) -> rx.event.EventSpec:
+    """Returns the script that sets or, for ``None``, drops one client figure."""
+    # The pushed value replaces the whole client dict, so it is built from
+    # the current one.
+    figures = _client_state_ref("plot_figures")
+    key = json.dumps(plot_id)
+    if figure_json is None:
+        update = f"(({{[{key}]: _, ...rest}}) => rest)({figures})"
+    else:
+        update = f"({{...{figures}, [{key}]: {figure_json}}})"
+    return plot_figures.push(rx.Var(update))
+
+
+def _queued_message(position: int) -> str:
+    uploads = "upload" if position == 1 else "uploads"
+    return f"Waiting for {position} other {uploads} to finish..."
+
 
 class DataState(rx.State):
     """Manages the application's data and UI state."""
 
     uploaded_filename: str = rx.LocalStorage("", name="dataviz_filename")
-    data: pd.DataFrame = pd.DataFrame()
+    uploaded_name: str = rx.LocalStorage("", name="dataviz_uploaded_name")
+    # Stored names of the updates merged into the upload, comma-separated.
+    uploaded_updates: str = rx.LocalStorage("", name="dataviz_uploaded_updates")
+    dataset_key: str = ""
     data_columns: list[str] = []
     is_loading: bool = False
     upload_message: str = "Upload a CSV file to begin."
@@ -33,6 +76,60 @@ class DataState(rx.State):
     x_axis_options: list[str] = ["Year", "Area"]
     variable_groups: list[str] = []
     editing_plot_id: str = ""
+    _figure_keys: dict[str, str] = {}
+
+    def _stored_upload(self) -> tuple[Path, list[tuple[Path, str]]]:
+        """The stored upload and its ``(path, key)`` updates, in merge order."""
+        upload_dir = rx.get_upload_dir()
+        updates = [
+            (upload_dir / n, upload_key(n))
+            for n in self.uploaded_updates.split(",")
+            if n
+        ]
+        return upload_dir / self.uploaded_filename, updates
+
+    def _stored_key(self) -> str:
+        """Key of the dataset the stored upload and its updates merge into."""
+        key = upload_key(self.uploaded_filename)
+        for name in self.uploaded_updates.split(","):
+            if name:
+                key = merged_key(key, upload_key(name))
+        return key
+
+    async def _get_dataset(self) -> Dataset | None:
+        """Returns the shared, read-only dataset behind this session's handle.
+
+        The registry only holds a few datasets per worker, so the handle can
+        outlive its entry: it may have been evicted, or the worker restarted.
+        The dataset is then reloaded from the stored upload and its updates.
+        """
+        dataset = get_dataset(self.dataset_key)
+        if dataset is not None or not self.dataset_key or not self.uploaded_filename:
+            return dataset
+        file_path, updates = self._stored_upload()
+        try:
+            size = sum(path.stat().st_size for path in [file_path, *dict(updates)])
+            with ingest_queue.ticket(size) as ticket:
+                async for _ in ingest_queue.waiting(ticket):
+                    pass
+                with span("reload", file=self.uploaded_filename):
+                    dataset = await asyncio.to_thread(
+                        load_with_updates, file_path, updates
+                    )
+        except (AdmissionError, OSError) as e:
+            logging.warning(f"Could not reload dataset {self.dataset_key}: {e}")
+            return None
+        if dataset.key != self.dataset_key:
+            logging.warning(
+                f"Stored upload no longer matches dataset {self.dataset_key}"
+            )
+            return None
+        return dataset
+
+    def _set_dataset(self, dataset: Dataset):
+        self.dataset_key = dataset.key
+        self.data_columns = dataset.frame.columns.tolist()
+        self.variable_groups = list(dataset.hierarchy.variable_groups)
 
     @rx.event
     def toggle_upload_page(self):
@@ -49,14 +146,18 @@ class DataState(rx.State):
 
     @rx.event
     async def reset_data(self):
-        self.data = pd.DataFrame()
+        self.dataset_key = ""
         self.data_columns = []
         slice_state = await self.get_state(SliceState)
-        slice_state.slices_json = "[]"
-        slice_state.create_new_slice()
+        slice_state._replace_slices({})
+        slice_state._create_slice()
         self.variable_groups = []
         self.uploaded_filename = ""
+        self.uploaded_name = ""
+        self.uploaded_updates = ""
         self.upload_message = "Upload a CSV file to begin."
+        figure_scripts = await self._sync_figures()
+        return [*slice_state._flush_slices(), *figure_scripts]
 
     @rx.event
     async def handle_upload(self, files: list[rx.UploadFile]):
@@ -69,24 +170,43 @@ class DataState(rx.State):
         yield
         try:
             file = files[0]
-            token = self.router.session.client_token
-            new_filename = f"{token}_{file.name}"
+            check_header(file.file)
+            with span("save_upload", file=file.name):
+                key = await save_upload(file, rx.get_upload_dir())
+            new_filename = upload_name(key)
             file_path = rx.get_upload_dir() / new_filename
-            with file_path.open("wb") as f:
-                data = await file.read()
-                f.write(data)
-            df = pd.read_csv(file_path)
-            df.columns = [col.strip() for col in df.columns]
-            self.data = df
-            self.data_columns = df.columns.tolist()
+            # A file another session already loaded is shared as is, without
+            # queueing or reserving memory for it.
+            dataset = get_dataset(key)
+            if dataset is None:
+                with ingest_queue.ticket(upload_size(file)) as ticket:
+                    async for position in ingest_queue.waiting(ticket):
+                        self.upload_message = _queued_message(position)
+                        yield
+                    latest: list[IngestProgress] = []
+                    with span("ingest", file=new_filename):
+                        ingest = asyncio.create_task(
+                            asyncio.to_thread(
+                                load_dataset, file_path, key, latest.append
+                            )
+                        )
+                        while not ingest.done():
+                            await asyncio.wait({ingest}, timeout=PROGRESS_INTERVAL)
+                            if latest and not ingest.done():
+                                self.upload_message = latest[-1].describe()
+                                latest.clear()
+                                yield
+                dataset = ingest.result()
+            self._set_dataset(dataset)
             slice_state = await self.get_state(SliceState)
-            slice_state.slices_json = "[]"
-            slice_state.create_new_slice()
-            self.variable_groups = ["All"] + sorted(
-                df["VariableGroup"].unique().tolist()
-            )
+            slice_state._replace_slices({})
+            slice_state._create_slice()
+            yield slice_state._flush_slices()
+            yield await self._sync_figures()
             self.upload_message = f"Successfully uploaded {file.name}."
             self.uploaded_filename = new_filename
+            self.uploaded_name = file.name
+            self.uploaded_updates = ""
             self.show_upload_page = False
         except Exception as e:
             logging.exception(f"Error processing file: {e}")
@@ -94,40 +214,118 @@ class DataState(rx.State):
         finally:
             self.is_loading = False
 
+    @rx.event
+    async def handle_merge_upload(self, files: list[rx.UploadFile]):
+        """Merges an update CSV into the loaded dataset, keeping the slices.
+
+        Rows of the update replace loaded rows with the same Variable, Area
+        and Year; only plots showing replaced or added rows are rebuilt.
+        """
+        if not files:
+            self.upload_message = "No file selected."
+            return
+        base = await self._get_dataset()
+        if base is None:
+            self.upload_message = "Load a dataset before merging an update."
+            return
+        self.is_loading = True
+        self.upload_message = "Processing update..."
+        yield
+        try:
+            file = files[0]
+            check_header(file.file)
+            with span("save_upload", file=file.name):
+                key = await save_upload(file, rx.get_upload_dir())
+            update_filename = upload_name(key)
+            file_path = rx.get_upload_dir() / update_filename
+            dataset = get_dataset(merged_key(base.key, key))
+            if dataset is None:
+                base_bytes = int(base.frame.memory_usage(index=False).sum())
+                size = upload_size(file) + base_bytes
+                with ingest_queue.ticket(size) as ticket:
+                    async for position in ingest_queue.waiting(ticket):
+                        self.upload_message = _queued_message(position)
+                        yield
+                    latest: list[IngestProgress] = []
+                    with span("merge", file=update_filename):
+                        merge = asyncio.create_task(
+                            asyncio.to_thread(
+                                apply_update, base, file_path, key, latest.append
+                            )
+                        )
+                        while not merge.done():
+                            await asyncio.wait({merge}, timeout=PROGRESS_INTERVAL)
+                            if latest and not merge.done():
+                                self.upload_message = latest[-1].describe()
+                                latest.clear()
+                                yield
+                dataset = merge.result()
+            self._set_dataset(dataset)
+            yield await self._sync_figures()
+            updates = [n for n in self.uploaded_updates.split(",") if n]
+            self.uploaded_updates = ",".join([*updates, update_filename])
+            self.upload_message = (
+                f"Merged {file.name}: {dataset.update.added_rows:,} rows added, "
+                f"{dataset.update.replaced_rows:,} replaced."
+            )
+            self.show_upload_page = False
+        except Exception as e:
+            logging.exception(f"Error merging file: {e}")
+            self.upload_message = f"Error merging file: {e}"
+        finally:
+            self.is_loading = False
+
     @rx.event
     async def load_data_from_storage(self):
         """Loads data from the filename stored in local storage."""
         if not self.uploaded_filename:
             return
         self.is_loading = True
-        self.upload_message = f"Loading {self.uploaded_filename}..."
+        name = self.uploaded_name or self.uploaded_filename
+        self.upload_message = f"Loading {name}..."
         yield
         try:
-            file_path = rx.get_upload_dir() / self.uploaded_filename
-            if not file_path.exists():
-                raise FileNotFoundError(
-                    f"File {self.uploaded_filename} not found on server."
-                )
-            df = pd.read_csv(file_path)
-            df.columns = [col.strip() for col in df.columns]
-            self.data = df
-            self.data_columns = df.columns.tolist()
-            self.variable_groups = ["All"] + sorted(
-                df["VariableGroup"].unique().tolist()
-            )
-            self.upload_message = f"Successfully loaded {self.uploaded_filename}."
+            file_path, updates = self._stored_upload()
+            # The dataset may be resident for another session; only a miss
+            # queues and reserves memory.
+            dataset = get_dataset(self.dataset_key) or get_dataset(self._stored_key())
+            if dataset is None:
+                for path in [file_path, *(path for path, _ in updates)]:
+                    if not path.exists():
+                        raise FileNotFoundError(f"File {name} not found on server.")
+                size = sum(path.stat().st_size for path in [file_path, *dict(updates)])
+                with ingest_queue.ticket(size) as ticket:
+                    async for position in ingest_queue.waiting(ticket):
+                        self.upload_message = _queued_message(position)
+                        yield
+                    self.upload_message = f"Loading {name}..."
+                    yield
+                    with span("ingest", file=self.uploaded_filename):
+                        dataset = await asyncio.to_thread(
+                            load_with_updates, file_path, updates
+                        )
+            for path in [file_path, *dict(updates)]:
+                mark_used(path)
+            self._set_dataset(dataset)
+            self.upload_message = f"Successfully loaded {name}."
             slice_state = await self.get_state(SliceState)
-            slices = slice_state.slices
+            slices = slice_state._get_slices()
             if not slice_state.active_slice_id and slices:
-                slice_state.active_slice_id = slices[0].id
+                slice_state.active_slice_id = next(iter(slices))
             elif not slices:
-                slice_state.create_new_slice()
+                slice_state._create_slice()
+                yield slice_state._flush_slices()
+            yield await self._sync_figures()
+        except AdmissionError as e:
+            self.upload_message = str(e)
         except Exception as e:
             logging.exception(f"Error loading stored file: {e}")
             self.upload_message = (
                 "Could not load previous dataset. Please upload a new file."
             )
             self.uploaded_filename = ""
+            self.uploaded_name = ""
+            self.uploaded_updates = ""
         finally:
             self.is_loading = False
 
@@ -135,152 +333,97 @@ class DataState(rx.State):
     async def remove_plot(self, plot_id: str):
         """Removes a plot from the list by its ID."""
         slice_state = await self.get_state(SliceState)
-        all_slices = slice_state.slices
-        for s in all_slices:
-            if s.id == slice_state.active_slice_id:
-                s.plots = [p for p in s.plots if p.id != plot_id]
-                break
-        slice_state.slices_json = json.dumps([s.model_dump() for s in all_slices])
+        active_slice = slice_state._get_active_slice()
+        if active_slice:
+            active_slice.remove_plot(plot_id)
+            slice_state._mark_slices_changed(active_slice.id)
+        figure_scripts = await self._sync_figures()
+        return [*slice_state._flush_slices(), *figure_scripts]
 
-    @rx.var
-    async def plot_figures(self) -> list[go.Figure]:
-        """Generates a list of Plotly figures for all configured plots."""
+    @timed
+    async def _sync_figures(self) -> list[rx.event.EventSpec]:
+        """Updates the figures of the plots of the active slice.
+
+        Figures are keyed by plot id and only replaced when the plot's
+        config or the rows behind it changed, so editing one plot or merging
+        an update it does not show does not rebuild or resend the others.
+        Returns the scripts that push the changed figures to the client.
+        """
         slice_state = await self.get_state(SliceState)
-        plots = slice_state.plots
-        figs = []
-        if self.data.empty:
-            return figs
-        for config_model in plots:
-            config = config_model.model_dump()
-            if config["plot_type"] == "invalid":
-                fig = go.Figure()
-                fig.add_annotation(
-                    x=0.5,
-                    y=0.5,
-                    xref="paper",
-                    yref="paper",
-                    text="Invalid Plot",
-                    showarrow=False,
-                    font=dict(size=20, color="red"),
-                )
-                figs.append(fig)
-                continue
-            df_filtered = self.data.copy()
-            if config["variable_group"] != "All":
-                df_filtered = df_filtered[
-                    df_filtered["VariableGroup"] == config["variable_group"]
-                ]
-            if config["subgroup"] != "All":
-                df_filtered = df_filtered[df_filtered["Subgroup"] == config["subgroup"]]
-            if config["variable"] != "All":
-                df_filtered = df_filtered[df_filtered["Variable"] == config["variable"]]
-            x, y, plot_type, series_by, series_values = (
-                config["x_axis"],
-                config["y_axis"],
-                config["plot_type"],
-                config["series_by"],
-                config["series_values"],
-            )
-            color = series_by if series_values else None
-            if series_by and series_values:
-                df_filtered = df_filtered[df_filtered[series_by].isin(series_values)]
-            if (
-                df_filtered.empty
-                or x not in df_filtered.columns
-                or y not in df_filtered.columns
-            ):
-                figs.append(go.Figure())
+        dataset = await self._get_dataset()
+        plots = slice_state.plots if dataset is not None else []
+        keys = {p.id: figure_key(dataset, p) for p in plots}
+        scripts = []
+        for plot_id in list(self._figure_keys):
+            if plot_id not in keys:
+                del self._figure_keys[plot_id]
+                scripts.append(_figure_script(plot_id, None))
+        stale = []
+        for p in plots:
+            previous_key = self._figure_keys.get(p.id)
+            if previous_key == keys[p.id]:
                 continue
-            hover_cols = [
-                col for col in ["Year", "Area", "Unit"] if col in df_filtered.columns
-            ]
-            cols_to_keep = list(set([x, y] + hover_cols + ([color] if color else [])))
-            df_sample = df_filtered[cols_to_keep].dropna(subset=[x, y])
-            if len(df_sample) > 500:
-                df_sample = df_sample.sample(n=500, random_state=42)
-            fig = None
-            try:
-                if plot_type == "scatter":
-                    fig = px.scatter(
-                        df_sample, x=x, y=y, color=color, hover_data=hover_cols
-                    )
-                elif plot_type == "line":
-                    fig = px.line(
-                        df_sample.sort_values(by=x),
-                        x=x,
-                        y=y,
-                        color=color,
-                        hover_data=hover_cols,
-                    )
-                elif plot_type in ("stacked bar", "multi bar"):
-                    group_cols = [x]
-                    if color:
-                        group_cols.append(color)
-                    agg_spec = {y: "mean"}
-                    for col in hover_cols:
-                        if col not in group_cols:
-                            agg_spec[col] = "first"
-                    df_agg = df_sample.groupby(group_cols, as_index=False).agg(agg_spec)
-                    barmode = "group" if plot_type == "multi bar" else "stack"
-                    fig = px.bar(
-                        df_agg,
-                        x=x,
-                        y=y,
-                        color=color,
-                        barmode=barmode,
-                        hover_data=hover_cols,
-                    )
-            except Exception as e:
-                logging.exception(f"Error creating plot: {e}")
-                fig = go.Figure()
-            if fig:
-                unit = ""
-                if "Unit" in df_filtered.columns:
-                    unit_series = df_filtered[df_filtered[y].notna()]["Unit"]
-                    if not unit_series.empty:
-                        unit = unit_series.iloc[0]
-                y_axis_title = unit if unit else y.replace("_", " ").title()
-                fig.update_layout(
-                    paper_bgcolor="rgba(0,0,0,0)",
-                    plot_bgcolor="rgba(0,0,0,0)",
-                    font={"color": "#6B7280", "family": "Inter"},
-                    xaxis={"gridcolor": "#E5E7EB"},
-                    yaxis={"gridcolor": "#E5E7EB", "title": y_axis_title},
-                    margin=dict(l=20, r=20, t=20, b=20),
-                )
+            if figure_unchanged(dataset, p, previous_key):
+                self._figure_keys[p.id] = keys[p.id]
             else:
-                fig = go.Figure()
-            figs.append(fig)
-        return figs
+                stale.append(p)
+        if not stale:
+            return scripts
+        with span("figures", plots=len(stale)):
+            figs = await build_figures(dataset, stale)
+        for config_model, figure_json in zip(stale, figs):
+            self._figure_keys[config_model.id] = keys[config_model.id]
+            scripts.append(_figure_script(config_model.id, figure_json))
+        return scripts
+
+    @rx.event
+    async def refresh_figures(self):
+        return await self._sync_figures()
+
+    @rx.event
+    async def push_figures(self):
+        """Sends every current figure, for a plot grid that was just mounted.
+
+        The figures come from the figure cache; one that was evicted is
+        rebuilt on the figure pool.
+        """
+        slice_state = await self.get_state(SliceState)
+        dataset = await self._get_dataset()
+        if dataset is None:
+            return []
+        plots = [p for p in slice_state.plots if p.id in self._figure_keys]
+        figs = await build_figures(dataset, plots)
+        return [_figure_script(p.id, fig) for p, fig in zip(plots, figs)]
 
     @rx.var
     async def plots_with_figures(self) -> list[dict]:
         """Pairs plot configs with titles for the UI."""
-        slice_state = await self.get_state(SliceState)
-        plots = slice_state.plots
-        if not plots:
-            return []
-        plots_with_figs = []
-        for i, config_model in enumerate(plots):
-            config = config_model.model_dump()
-            y_title = config["y_axis"].replace("_", " ").title()
-            x_title = config["x_axis"].replace("_", " ").title()
-            main_subject = y_title
-            filter_parts = []
-            if config["variable_group"] != "All":
-                filter_parts.append(config["variable_group"])
-            if config["subgroup"] != "All":
-                filter_parts.append(config["subgroup"])
-            if config["variable"] != "All":
-                filter_parts.append(config["variable"])
-            if filter_parts:
-                main_subject = ", ".join(filter_parts)
-            title = f"{main_subject} vs. {x_title}"
-            if config["series_by"]:
-                title += f" by {config['series_by']}"
-            plot_info = {**config, "title": title}
-            plots_with_figs.append(plot_info)
-        return plots_with_figs
+        with timer("var", "DataState.plots_with_figures"):
+            slice_state = await self.get_state(SliceState)
+            plots = slice_state.plots
+            if not plots:
+                return []
+            plots_with_figs = []
+            for i, config_model in enumerate(plots):
+                config = config_model.model_dump()
+                y_title = config["y_axis"].replace("_", " ").title()
+                x_title = config["x_axis"].replace("_", " ").title()
+                main_subject = y_title
+                filter_parts = []
+                if config["variable_group"] != "All":
+                    filter_parts.append(config["variable_group"])
+                if config["subgroup"] != "All":
+                    filter_parts.append(config["subgroup"])
+                if config["variable"] != "All":
+                    filter_parts.append(config["variable"])
+                if filter_parts:
+                    main_subject = ", ".join(filter_parts)
+                title = f"{main_subject} vs. {x_title}"
+                if config["series_by"]:
+                    title += f" by {config['series_by']}"
+                plot_info = {**config, "title": title}
+                plots_with_figs.append(plot_info)
+            return plots_with_figs
 
     @rx.event
     async def set_show_add_chart_modal(self, open: bool):
@@ -291,4 +434,7 @@ class DataState(rx.State):
         if open:
             yield PlotState.init_modal_options
         else:
-            yield PlotState.cancel_editing
\ No newline at end of file
+            yield PlotState.cancel_editing
+
+
+instrument_events(DataState)
\ No newline at end of file
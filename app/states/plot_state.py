@@ -1,9 +1,11 @@
 import reflex as rx
-import pandas as pd
 import logging
 import uuid
-import json
 from typing import Literal
+from app.data.ranking import EMPTY_RANKING, SeriesRanking, series_ranking
+from app.data.registry import Dataset
+from app.metrics import instrument_events, timed, timer
+from app.states.data_state import DataState
 from app.states.slice_state import SliceState, PlotConfig
 
 
@@ -30,78 +32,76 @@ class PlotState(rx.State):
             return "Year"
         return ""
 
+    @timed
     async def _update_dropdown_options(self):
         """Helper method to compute available subgroups and variables based on current selections."""
-        from app.states.data_state import DataState
-
         data_state = await self.get_state(DataState)
-        if data_state.data.empty:
+        dataset = await data_state._get_dataset()
+        if dataset is None:
             self.available_subgroups = ["All"]
             self.available_variables = ["All"]
             return
-        df = data_state.data.copy()
-        sub_df = df.copy()
-        if self.new_plot_variable_group != "All":
-            sub_df = sub_df[sub_df["VariableGroup"] == self.new_plot_variable_group]
-        new_subgroups = ["All"] + sorted(sub_df["Subgroup"].unique().tolist())
-        self.available_subgroups = [str(s) for s in new_subgroups]
-        var_df = sub_df.copy()
-        if self.new_plot_subgroup != "All":
-            var_df = var_df[var_df["Subgroup"] == self.new_plot_subgroup]
-        new_variables = ["All"] + sorted(var_df["Variable"].unique().tolist())
-        self.available_variables = [str(v) for v in new_variables]
+        hierarchy = dataset.hierarchy
+        self.available_subgroups = hierarchy.subgroups(self.new_plot_variable_group)
+        self.available_variables = hierarchy.variables(
+            self.new_plot_variable_group, self.new_plot_subgroup
+        )
 
     @rx.event
     async def init_modal_options(self):
         """Initializes options when the modal is opened."""
         await self._update_dropdown_options()
 
-    async def _get_filtered_data_for_controls(self) -> pd.DataFrame:
-        from app.states.data_state import DataState
-
+    async def _get_dataset(self) -> Dataset | None:
         data_state = await self.get_state(DataState)
-        if data_state.data.empty:
-            return pd.DataFrame()
-        df = data_state.data.copy()
-        if self.new_plot_variable_group != "All":
-            df = df[df["VariableGroup"] == self.new_plot_variable_group]
-        if self.new_plot_subgroup != "All":
-            df = df[df["Subgroup"] == self.new_plot_subgroup]
-        if self.new_plot_variable != "All":
-            df = df[df["Variable"] == self.new_plot_variable]
-        return df
+        return await data_state._get_dataset()
 
-    @rx.var
-    async def series_options(self) -> list[str]:
+    async def _series_ranking(self) -> SeriesRanking:
         if not self.series_by:
-            return []
-        df = await self._get_filtered_data_for_controls()
-        if df.empty:
-            return []
-        sorted_options = []
-        if self.series_by == "Area" and "Value" in df.columns:
-            avg_values = df.groupby("Area")["Value"].mean().sort_values(ascending=False)
-            sorted_options = avg_values.index.tolist()
-        elif self.series_by in df.columns:
-            unique_values = df[self.series_by].unique()
-            try:
-                sorted_numeric = sorted(unique_values, key=float, reverse=True)
-                return [str(v) for v in sorted_numeric]
-            except (ValueError, TypeError):
-                sorted_alpha = sorted(unique_values)
-                return [str(v) for v in sorted_alpha]
-        return [str(opt) for opt in sorted_options]
-
-    @rx.var
+            return EMPTY_RANKING
+        dataset = await self._get_dataset()
+        if dataset is None:
+            return EMPTY_RANKING
+        return series_ranking(
+            dataset,
+            self.new_plot_variable_group,
+            self.new_plot_subgroup,
+            self.new_plot_variable,
+            self.series_by,
+        )
+
+    # Reflex cannot trace dependencies through get_state, so the ranking's
+    # inputs are listed explicitly.
+    @rx.var(
+        deps=[
+            "series_by",
+            "new_plot_variable_group",
+            "new_plot_subgroup",
+            "new_plot_variable",
+            DataState.dataset_key,
+        ],
+        auto_deps=False,
+    )
+    async def series_options(self) -> list[str]:
+        with timer("var", "PlotState.series_options"):
+            ranking = await self._series_ranking()
+            return list(ranking.options)
+
+    @rx.var(
+        deps=[
+            "series_by",
+            "new_plot_variable_group",
+            "new_plot_subgroup",
+            "new_plot_variable",
+            DataState.dataset_key,
+            "series_filter_text",
+        ],
+        auto_deps=False,
+    )
     async def filtered_series_options(self) -> list[str]:
-        options = await self.series_options
-        if self.series_filter_text.strip() == "":
-            return options
-        return [
-            opt
-            for opt in options
-            if self.series_filter_text.lower() in str(opt).lower()
-        ]
+        with timer("var", "PlotState.filtered_series_options"):
+            ranking = await self._series_ranking()
+            return ranking.search(self.series_filter_text)
 
     @rx.event
     async def set_new_plot_variable_group(self, value: str):
@@ -141,6 +141,11 @@ class PlotState(rx.State):
         else:
             self.new_plot_series_values.append(value)
 
+    @rx.event
+    def set_series_filter_text(self, value: str):
+        if value != self.series_filter_text:
+            self.series_filter_text = value
+
     @rx.event
     def clear_series_filter_text(self):
         self.series_filter_text = ""
@@ -152,8 +157,6 @@ class PlotState(rx.State):
             await self._reset_new_plot_fields()
 
     async def _reset_new_plot_fields(self):
-        from app.states.data_state import DataState
-
         data_state = await self.get_state(DataState)
         x_axis_options = data_state.x_axis_options
         self.new_plot_type = "scatter"
@@ -172,22 +175,8 @@ class PlotState(rx.State):
         if not self.series_by:
             self.new_plot_series_values = []
             return
-        df = await self._get_filtered_data_for_controls()
-        if df.empty:
-            self.new_plot_series_values = []
-            return
-        sorted_options = []
-        if self.series_by == "Area" and "Value" in df.columns:
-            avg_values = df.groupby("Area")["Value"].mean().sort_values(ascending=False)
-            sorted_options = [str(opt) for opt in avg_values.index.tolist()]
-        elif self.series_by in df.columns:
-            unique_values = df[self.series_by].unique()
-            try:
-                sorted_options = [
-                    str(v) for v in sorted(unique_values, key=float, reverse=True)
-                ]
-            except (ValueError, TypeError):
-                sorted_options = [str(v) for v in sorted(unique_values)]
+        ranking = await self._series_ranking()
+        sorted_options = list(ranking.options)
         if value == "None" or value == "":
             self.new_plot_series_values = []
         elif value == "All":
@@ -201,16 +190,11 @@ class PlotState(rx.State):
 
     @rx.event
     async def start_editing_plot(self, plot_id: str):
-        from app.states.data_state import DataState
-
         self.editing_plot_id = plot_id
         data_state = await self.get_state(DataState)
         slice_state = await self.get_state(SliceState)
-        plot_to_edit = None
-        for p in slice_state.plots:
-            if p.id == plot_id:
-                plot_to_edit = p
-                break
+        active_slice = slice_state._get_active_slice()
+        plot_to_edit = active_slice.get_plot(plot_id) if active_slice else None
         if plot_to_edit:
             self.new_plot_type = plot_to_edit.plot_type
             self.new_plot_x_axis = plot_to_edit.x_axis
@@ -225,8 +209,6 @@ class PlotState(rx.State):
 
     @rx.event
     async def save_plot(self):
-        from app.states.data_state import DataState
-
         data_state = await self.get_state(DataState)
         slice_state = await self.get_state(SliceState)
         plot_data = {
@@ -239,22 +221,20 @@ class PlotState(rx.State):
             "series_by": self.series_by,
             "series_values": self.new_plot_series_values,
         }
-        all_slices = slice_state.slices
-        for s in all_slices:
-            if s.id == slice_state.active_slice_id:
-                if self.editing_plot_id:
-                    for i, p in enumerate(s.plots):
-                        if p.id == self.editing_plot_id:
-                            updated_plot = PlotConfig(
-                                id=self.editing_plot_id, **plot_data
-                            )
-                            s.plots[i] = updated_plot
-                            break
-                else:
-                    new_plot = PlotConfig(id=str(uuid.uuid4()), **plot_data)
-                    s.plots.append(new_plot)
-                break
-        slice_state.slices_json = json.dumps([s.model_dump() for s in all_slices])
+        active_slice = slice_state._get_active_slice()
+        if active_slice and self.editing_plot_id:
+            if active_slice.get_plot(self.editing_plot_id):
+                plot = PlotConfig(id=self.editing_plot_id, **plot_data)
+                active_slice.put_plot(plot)
+        elif active_slice:
+            active_slice.put_plot(PlotConfig(id=str(uuid.uuid4()), **plot_data))
+        if active_slice:
+            slice_state._mark_slices_changed(active_slice.id)
+        figure_scripts = await data_state._sync_figures()
         data_state.show_add_chart_modal = False
         self.editing_plot_id = ""
-        await self._reset_new_plot_fields()
\ No newline at end of file
+        await self._reset_new_plot_fields()
+        return [*slice_state._flush_slices(), *figure_scripts]
+
+
+instrument_events(PlotState)
\ No newline at end of file
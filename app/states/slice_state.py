@@ -1,9 +1,16 @@
 import reflex as rx
+import base64
 import logging
 import uuid
-from pydantic import BaseModel
+import zlib
+from pydantic import BaseModel, PrivateAttr
 import json
 from typing import Literal
+from app.metrics import instrument_events
+
+SLICE_KEY_PREFIX = "dataviz_slice:"
+SLICE_ORDER_KEY = "dataviz_slice_order"
+SLICE_CODEC_VERSION = 1
 
 
 class PlotConfig(BaseModel):
@@ -22,9 +29,152 @@ class Slice(BaseModel):
     id: str
     name: str
     plots: list[PlotConfig] = []
+    _plot_positions: dict[str, int] = PrivateAttr(default_factory=dict)
+
+    def _plot_position(self, plot_id: str) -> int | None:
+        """Position of a plot in ``plots``, from an index rebuilt when stale."""
+        i = self._plot_positions.get(plot_id)
+        if len(self._plot_positions) != len(self.plots) or (
+            i is not None and self.plots[i].id != plot_id
+        ):
+            self._plot_positions = {p.id: i for i, p in enumerate(self.plots)}
+            i = self._plot_positions.get(plot_id)
+        return i
+
+    def get_plot(self, plot_id: str) -> PlotConfig | None:
+        i = self._plot_position(plot_id)
+        return None if i is None else self.plots[i]
+
+    def put_plot(self, plot: PlotConfig):
+        """Replaces the plot with the same id, or appends it."""
+        i = self._plot_position(plot.id)
+        if i is None:
+            self._plot_positions[plot.id] = len(self.plots)
+            self.plots.append(plot)
+        else:
+            self.plots[i] = plot
+
+    def remove_plot(self, plot_id: str):
+        i = self._plot_position(plot_id)
+        if i is not None:
+            del self.plots[i]
+            self._plot_positions = {}
+
+
+class SliceSummary(BaseModel):
+    id: str
+    name: str
+
+
+def _validate_slice(s_data: dict) -> Slice:
+    """Validates one stored slice, keeping broken plots as "invalid" plots.
+
+    One broken config thus does not take its slice down with it.
+    """
+    validated_plots = []
+    if "plots" in s_data and isinstance(s_data["plots"], list):
+        for p_data in s_data["plots"]:
+            try:
+                validated_plots.append(PlotConfig.model_validate(p_data))
+            except Exception as e:
+                logging.exception(f"Invalid plot config found: {p_data}. Error: {e}")
+                invalid_plot_data = {
+                    "id": p_data.get("id", uuid.uuid4()),
+                    "plot_type": "invalid",
+                    "x_axis": p_data.get("x_axis", ""),
+                    "y_axis": p_data.get("y_axis", ""),
+                    "variable_group": p_data.get("variable_group", ""),
+                    "subgroup": p_data.get("subgroup", ""),
+                    "variable": p_data.get("variable", ""),
+                    "series_by": p_data.get("series_by", ""),
+                    "series_values": p_data.get("series_values", []),
+                }
+                validated_plots.append(PlotConfig.model_validate(invalid_plot_data))
+    s_data["plots"] = validated_plots
+    return Slice.model_validate(s_data)
+
+
+def parse_slices(slices_json: str) -> dict[str, Slice]:
+    """Parses the single JSON blob older versions kept in LocalStorage."""
+    if not slices_json:
+        return {}
+    try:
+        validated_slices = {}
+        for s_data in json.loads(slices_json):
+            validated_slice = _validate_slice(s_data)
+            validated_slices[validated_slice.id] = validated_slice
+        return validated_slices
+    except (json.JSONDecodeError, TypeError) as e:
+        logging.exception(f"Error decoding slices JSON: {e}")
+        return {}
+
+
+def encode_slice(slice_model: Slice) -> str:
+    """Encodes a slice as compressed JSON for its own LocalStorage entry.
+
+    Plots are stored as rows under one shared field list, and series
+    values as indexes into a table of the distinct values in the slice.
+    """
+    fields = [f for f in PlotConfig.model_fields if f != "series_values"]
+    values: dict[str, int] = {}
+    rows = []
+    for plot in slice_model.plots:
+        row = [getattr(plot, f) for f in fields]
+        row.append([values.setdefault(v, len(values)) for v in plot.series_values])
+        rows.append(row)
+    payload = {
+        "v": SLICE_CODEC_VERSION,
+        "id": slice_model.id,
+        "name": slice_model.name,
+        "fields": fields,
+        "values": list(values),
+        "plots": rows,
+    }
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.b64encode(zlib.compress(raw, 9)).decode("ascii")
+
+
+def decode_slice(blob: str) -> Slice:
+    payload = json.loads(zlib.decompress(base64.b64decode(blob)))
+    fields, values = payload["fields"], payload["values"]
+    plots = []
+    for row in payload["plots"]:
+        p_data = dict(zip(fields, row))
+        p_data["series_values"] = [values[i] for i in row[len(fields)]]
+        plots.append(p_data)
+    return _validate_slice(
+        {"id": payload["id"], "name": payload["name"], "plots": plots}
+    )
+
+
+def _storage_script(writes: dict[str, str | None]) -> str:
+    """JavaScript that applies ``writes`` to LocalStorage; None removes a key."""
+    statements = []
+    for key, value in writes.items():
+        if value is None:
+            statements.append(f"localStorage.removeItem({json.dumps(key)});")
+        else:
+            statements.append(
+                f"localStorage.setItem({json.dumps(key)}, {json.dumps(value)});"
+            )
+    return "".join(statements)
+
+
+_READ_SLICES_SCRIPT = f"""(() => {{
+    const stored = {{}};
+    for (let i = 0; i < localStorage.length; i++) {{
+        const key = localStorage.key(i);
+        if (key.startsWith("{SLICE_KEY_PREFIX}") || key === "{SLICE_ORDER_KEY}") {{
+            stored[key] = localStorage.getItem(key);
+        }}
+    }}
+    return stored;
+}})()"""
 
 
 class SliceState(rx.State):
+    # Slices used to be stored as one JSON blob under this key; it is only
+    # read to migrate them to per-slice entries.
     slices_json: str = rx.LocalStorage("[]", name="dataviz_slices")
     active_slice_id: str = rx.LocalStorage("", name="dataviz_active_slice_id")
     is_renaming_slice: bool = False
@@ -35,53 +185,100 @@ class SliceState(rx.State):
     parsed_slices: list[Slice] = []
     slices_to_import: list[str] = []
     import_message: str = ""
+    _slices: dict[str, Slice] = {}
+    _slices_version: int = 0
+    _changed_slice_ids: set[str] = set()
+    _slice_order_changed: bool = False
 
     @rx.var
-    def slices(self) -> list[Slice]:
-        if not self.slices_json:
-            return []
-        try:
-            slices_data = json.loads(self.slices_json)
-            validated_slices = []
-            for s_data in slices_data:
-                validated_plots = []
-                if "plots" in s_data and isinstance(s_data["plots"], list):
-                    for p_data in s_data["plots"]:
-                        try:
-                            validated_plots.append(PlotConfig.model_validate(p_data))
-                        except Exception as e:
-                            logging.exception(
-                                f"Invalid plot config found: {p_data}. Error: {e}"
-                            )
-                            invalid_plot_data = {
-                                "id": p_data.get("id", uuid.uuid4()),
-                                "plot_type": "invalid",
-                                "x_axis": p_data.get("x_axis", ""),
-                                "y_axis": p_data.get("y_axis", ""),
-                                "variable_group": p_data.get("variable_group", ""),
-                                "subgroup": p_data.get("subgroup", ""),
-                                "variable": p_data.get("variable", ""),
-                                "series_by": p_data.get("series_by", ""),
-                                "series_values": p_data.get("series_values", []),
-                            }
-                            validated_plots.append(
-                                PlotConfig.model_validate(invalid_plot_data)
-                            )
-                s_data["plots"] = validated_plots
-                validated_slices.append(Slice.model_validate(s_data))
-            return validated_slices
-        except (json.JSONDecodeError, TypeError) as e:
-            logging.exception(f"Error decoding slices JSON: {e}")
+    def slices(self) -> list[SliceSummary]:
+        return [SliceSummary(id=s.id, name=s.name) for s in self._get_slices().values()]
+
+    def _get_slices(self) -> dict[str, Slice]:
+        """Returns the session's slices, keyed by id in display order.
+
+        Handlers edit the models in place and then call
+        ``_mark_slices_changed``, which Reflex cannot see on its own; reading
+        the version here makes computed vars recompute after such edits.
+        """
+        _ = self._slices_version
+        return self._slices
+
+    def _mark_slices_changed(self, *slice_ids: str, order: bool = False):
+        """Records slices to persist on the next ``_flush_slices``.
+
+        Ids of deleted slices are passed as well, so their entries are
+        removed; ``order`` marks a change to the list of slices.
+        """
+        self._changed_slice_ids.update(slice_ids)
+        self._slice_order_changed = self._slice_order_changed or order
+        self._slices_version += 1
+
+    def _replace_slices(self, slices: dict[str, Slice]):
+        self._mark_slices_changed(*self._slices, *slices, order=True)
+        self._slices = slices
+
+    def _flush_slices(self) -> list[rx.event.EventSpec]:
+        """Returns the script writing the changed slices to LocalStorage.
+
+        Each slice has its own compressed entry, so an edit only sends and
+        rewrites the slices it touched.
+        """
+        all_slices = self._get_slices()
+        writes = {}
+        for slice_id in self._changed_slice_ids:
+            slice_model = all_slices.get(slice_id)
+            writes[SLICE_KEY_PREFIX + slice_id] = (
+                encode_slice(slice_model) if slice_model else None
+            )
+        if self._slice_order_changed:
+            writes[SLICE_ORDER_KEY] = json.dumps(list(all_slices))
+        self._changed_slice_ids = set()
+        self._slice_order_changed = False
+        if not writes:
             return []
+        return [rx.call_script(_storage_script(writes))]
+
+    @rx.event
+    def restore_slices(self):
+        """Reads the slices stored in this browser back into the session."""
+        return rx.call_script(
+            _READ_SLICES_SCRIPT, callback=SliceState.load_stored_slices
+        )
+
+    @rx.event
+    def load_stored_slices(self, stored: dict[str, str]):
+        from app.states.data_state import DataState
+
+        slices = {}
+        order = json.loads(stored.get(SLICE_ORDER_KEY) or "[]")
+        for slice_id in order:
+            blob = stored.get(SLICE_KEY_PREFIX + slice_id)
+            if blob is None:
+                continue
+            try:
+                slices[slice_id] = decode_slice(blob)
+            except Exception as e:
+                logging.exception(f"Error decoding stored slice {slice_id}: {e}")
+        self._slices = slices
+        orphans = [
+            key.removeprefix(SLICE_KEY_PREFIX)
+            for key in stored
+            if key.startswith(SLICE_KEY_PREFIX)
+            and key.removeprefix(SLICE_KEY_PREFIX) not in slices
+        ]
+        self._mark_slices_changed(*orphans)
+        if SLICE_ORDER_KEY not in stored and self.slices_json not in ("", "[]"):
+            self._replace_slices(parse_slices(self.slices_json))
+            self.slices_json = ""
+        return [*self._flush_slices(), DataState.load_data_from_storage]
 
     @rx.var
     def active_slice(self) -> Slice | None:
-        if not self.active_slice_id:
-            return None
-        for s in self.slices:
-            if s.id == self.active_slice_id:
-                return s
-        return None
+        return self._get_active_slice()
+
+    def _get_active_slice(self) -> Slice | None:
+        return self._get_slices().get(self.active_slice_id)
 
     @rx.var
     def plots(self) -> list[PlotConfig]:
@@ -89,21 +286,29 @@ class SliceState(rx.State):
             return self.active_slice.plots
         return []
 
-    @rx.event
-    def create_new_slice(self):
+    def _create_slice(self):
         new_slice_id = str(uuid.uuid4())
-        all_slices = self.slices
+        all_slices = self._get_slices()
         new_slice = Slice(id=new_slice_id, name=f"Slice {len(all_slices) + 1}")
-        all_slices.append(new_slice)
-        self.slices_json = json.dumps([s.model_dump() for s in all_slices])
+        all_slices[new_slice_id] = new_slice
+        self._mark_slices_changed(new_slice_id, order=True)
         self.active_slice_id = new_slice_id
 
+    @rx.event
+    def create_new_slice(self):
+        self._create_slice()
+        return self._flush_slices()
+
     @rx.event
     def set_active_slice_id(self, slice_id: str):
+        from app.states.data_state import DataState
+
         if slice_id == "new":
-            return SliceState.create_new_slice
+            self._create_slice()
+            return [*self._flush_slices(), DataState.refresh_figures]
         else:
             self.active_slice_id = slice_id
+            return DataState.refresh_figures
 
     @rx.event
     def toggle_rename_slice(self):
@@ -122,20 +327,19 @@ class SliceState(rx.State):
         if not self.current_slice_name.strip():
             self.is_renaming_slice = False
             return
-        all_slices = self.slices
-        for s in all_slices:
-            if s.id == self.active_slice_id:
-                s.name = self.current_slice_name
-                break
-        self.slices_json = json.dumps([s.model_dump() for s in all_slices])
+        active_slice = self._get_active_slice()
+        if active_slice:
+            active_slice.name = self.current_slice_name
+            self._mark_slices_changed(active_slice.id)
         self.is_renaming_slice = False
         self.current_slice_name = ""
+        return self._flush_slices()
 
     @rx.event
     def set_show_export_modal(self, open: bool):
         self.show_export_modal = open
         if open:
-            self.slices_to_export = [s.id for s in self.slices]
+            self.slices_to_export = list(self._get_slices())
         else:
             self.slices_to_export = []
 
@@ -160,7 +364,7 @@ class SliceState(rx.State):
 
     @rx.event
     def select_all_for_export(self):
-        self.slices_to_export = [s.id for s in self.slices]
+        self.slices_to_export = list(self._get_slices())
 
     @rx.event
     def select_none_for_export(self):
@@ -169,8 +373,11 @@ class SliceState(rx.State):
     @rx.event
     def export_selected_slices(self):
         """Exports selected slices as a JSON file."""
+        all_slices = self._get_slices()
         selected_slices_data = [
-            s.model_dump() for s in self.slices if s.id in self.slices_to_export
+            all_slices[slice_id].model_dump()
+            for slice_id in dict.fromkeys(self.slices_to_export)
+            if slice_id in all_slices
         ]
         if not selected_slices_data:
             return rx.toast("No slices selected for export.")
@@ -226,29 +433,35 @@ class SliceState(rx.State):
     def import_selected_slices(self):
         if not self.slices_to_import:
             return rx.toast("No slices selected for import.")
-        all_slices = self.slices
-        existing_slice_ids = {s.id for s in all_slices}
-        imported_count = 0
+        all_slices = self._get_slices()
+        selected_ids = set(self.slices_to_import)
+        new_slices = {}
         for new_slice in self.parsed_slices:
-            if (
-                new_slice.id in self.slices_to_import
-                and new_slice.id not in existing_slice_ids
-            ):
-                all_slices.append(new_slice)
-                existing_slice_ids.add(new_slice.id)
-                imported_count += 1
-        self.slices_json = json.dumps([s.model_dump() for s in all_slices])
+            if new_slice.id in selected_ids and new_slice.id not in all_slices:
+                new_slices.setdefault(new_slice.id, new_slice.model_copy(deep=True))
+        all_slices.update(new_slices)
+        imported_count = len(new_slices)
+        self._mark_slices_changed(*new_slices, order=bool(new_slices))
         self.set_show_import_modal(False)
-        return rx.toast(f"Successfully imported {imported_count} new slices.")
+        return [
+            *self._flush_slices(),
+            rx.toast(f"Successfully imported {imported_count} new slices."),
+        ]
 
     @rx.event
     def delete_active_slice(self):
-        if not self.active_slice_id or len(self.slices) <= 1:
+        from app.states.data_state import DataState
+
+        all_slices = self._get_slices()
+        if not self.active_slice_id or len(all_slices) <= 1:
             return rx.toast("Cannot delete the last slice.", duration=3000)
-        all_slices = self.slices
-        all_slices = [s for s in all_slices if s.id != self.active_slice_id]
-        self.slices_json = json.dumps([s.model_dump() for s in all_slices])
+        all_slices.pop(self.active_slice_id, None)
+        self._mark_slices_changed(self.active_slice_id, order=True)
         if all_slices:
-            self.active_slice_id = all_slices[0].id
+            self.active_slice_id = next(iter(all_slices))
         else:
-            self.create_new_slice()
\ No newline at end of file
+            self._create_slice()
+        return [*self._flush_slices(), DataState.refresh_figures]
+
+
+instrument_events(SliceState)
\ No newline at end of file
@@ -0,0 +1,117 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse
+
+TRACE_ENABLED = os.environ.get("DATAVIZ_TRACE", "").lower() in ("1", "true", "yes")
+TRACE_MAX_EVENTS = int(os.environ.get("DATAVIZ_TRACE_MAX_EVENTS", 200_000))
+SLOW_PLOT_SECONDS = float(os.environ.get("DATAVIZ_SLOW_PLOT_SECONDS", 1.0))
+TRACE_ROUTE = "/trace"
+
+
+class Span:
+    """One timed stage, with the total time of its direct child stages."""
+
+    __slots__ = ("name", "args", "duration", "stages")
+
+    def __init__(self, name: str, args: dict):
+        self.name = name
+        self.args = args
+        self.duration = 0.0
+        self.stages: dict[str, float] = {}
+
+    def describe(self) -> str:
+        stages = ", ".join(
+            f"{name} {seconds * 1000:.0f} ms" for name, seconds in self.stages.items()
+        )
+        return f"{self.duration * 1000:.0f} ms" + (f" ({stages})" if stages else "")
+
+
+_current: ContextVar[Span | None] = ContextVar("dataviz_span", default=None)
+_events: deque[dict] = deque(maxlen=TRACE_MAX_EVENTS)
+_thread_names: dict[int, str] = {}
+_lock = threading.Lock()
+
+
+@contextmanager
+def span(name: str, **args) -> Iterator[Span]:
+    """Times the enclosed block as a stage of the enclosing span.
+
+    The duration is always added to the parent's ``stages`` for the slow
+    log. Trace events are only kept when DATAVIZ_TRACE is set. The
+    current span lives in a context variable, so work handed to a thread
+    with ``contextvars.copy_context()`` or ``asyncio.to_thread`` nests
+    under the span that started it.
+    """
+    parent = _current.get()
+    current = Span(name, args)
+    token = _current.set(current)
+    start = time.perf_counter_ns()
+    try:
+        yield current
+    finally:
+        end = time.perf_counter_ns()
+        _current.reset(token)
+        current.duration = (end - start) / 1e9
+        if parent is not None:
+            with _lock:
+                parent.stages[name] = parent.stages.get(name, 0.0) + current.duration
+        if TRACE_ENABLED:
+            _record(current, start, end)
+
+
+def _record(current: Span, start: int, end: int):
+    tid = threading.get_native_id()
+    event = {
+        "name": current.name,
+        "cat": "dataviz",
+        "ph": "X",
+        "ts": start / 1000,
+        "dur": (end - start) / 1000,
+        "pid": os.getpid(),
+        "tid": tid,
+        "args": {key: str(value) for key, value in current.args.items()},
+    }
+    with _lock:
+        _thread_names.setdefault(tid, threading.current_thread().name)
+        _events.append(event)
+
+
+def log_if_slow(current: Span, threshold: float = SLOW_PLOT_SECONDS):
+    """Logs a span and its stage breakdown if it took longer than ``threshold``."""
+    if current.duration <= threshold:
+        return
+    args = " ".join(f"{key}={value}" for key, value in current.args.items())
+    logging.warning(f"Slow {current.name} {args}: {current.describe()}")
+
+
+def chrome_trace() -> dict:
+    """The recorded spans as a Chrome trace-event document.
+
+    The document opens in Perfetto (ui.perfetto.dev) or chrome://tracing.
+    Each worker thread is its own track, and spans nest by time.
+    """
+    pid = os.getpid()
+    with _lock:
+        events = list(_events)
+        names = dict(_thread_names)
+    metadata = [
+        {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": n}}
+        for tid, n in names.items()
+    ]
+    return {"traceEvents": metadata + events, "displayTimeUnit": "ms"}
+
+
+async def trace_endpoint(request: Request):
+    if not TRACE_ENABLED:
+        return PlainTextResponse("Tracing is off; set DATAVIZ_TRACE=1.", 404)
+    return JSONResponse(
+        chrome_trace(),
+        headers={"Content-Disposition": 'attachment; filename="dataviz-trace.json"'},
+    )
\ No newline at end of file
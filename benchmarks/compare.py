@@ -0,0 +1,54 @@
+"""Compares two benchmark reports written by ``benchmarks.run``."""
+
+import argparse
+import json
+from pathlib import Path
+
+
+def compare(
+    baseline: dict, current: dict
+) -> list[tuple[str, str, float, float, float]]:
+    """Returns (size, benchmark, baseline ms, current ms, ratio) rows.
+
+    Median times are compared for every benchmark present in both reports.
+    """
+    rows = []
+    for size, entry in current["sizes"].items():
+        base_results = baseline["sizes"].get(size, {}).get("results", {})
+        for name, result in entry["results"].items():
+            if name not in base_results:
+                continue
+            before = base_results[name]["median_ms"]
+            after = result["median_ms"]
+            ratio = after / before if before else float("inf")
+            rows.append((size, name, before, after, ratio))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("baseline", type=Path)
+    parser.add_argument("current", type=Path)
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.2,
+        help="ratio above which a benchmark counts as a regression",
+    )
+    args = parser.parse_args()
+    baseline = json.loads(args.baseline.read_text())
+    current = json.loads(args.current.read_text())
+    rows = compare(baseline, current)
+    print(f"{baseline.get('commit') or '?'} -> {current.get('commit') or '?'}")
+    regressions = 0
+    for size, name, before, after, ratio in rows:
+        flag = ""
+        if ratio > args.threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        print(f"{size:>5} {name:<32} {before:10.3f} {after:10.3f} {ratio:6.2f}x{flag}")
+    raise SystemExit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,244 @@
+"""Offline micro-benchmarks of the dashboard's state logic.
+
+Times ingest, the dropdown cascade, series ranking, every plot type's
+figure build and slice persistence on synthetic AQUASTAT data, without a
+browser or a running Reflex server, and writes a JSON report that
+``benchmarks.compare`` can diff across commits.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+from collections.abc import Callable
+from datetime import datetime, timezone
+from pathlib import Path
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+from app.data import ranking
+from app.data.cube import AggregateCube
+from app.data.figures import build_figure
+from app.data.index import FilterIndex, HierarchyIndex
+from app.data.ingest import read_csv
+from app.data.registry import Dataset, file_hash
+from app.data.storage import load_dataset, sidecar_path
+from app.states.slice_state import (
+    PlotConfig,
+    Slice,
+    decode_slice,
+    encode_slice,
+    parse_slices,
+)
+from benchmarks.synthetic import SIZES, dataset_path
+
+REPORT_VERSION = 1
+PLOT_TYPES = ["scatter", "line", "stacked bar", "multi bar"]
+
+
+def measure(fn: Callable[[], object], repeat: int) -> dict[str, float]:
+    """Runs ``fn`` ``repeat`` times and summarizes the wall times in ms."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        fn()
+        times.append((time.perf_counter_ns() - start) / 1e6)
+    times.sort()
+    return {
+        "repeat": repeat,
+        "min_ms": times[0],
+        "median_ms": statistics.median(times),
+        "mean_ms": statistics.fmean(times),
+        "max_ms": times[-1],
+    }
+
+
+def _top_areas(dataset: Dataset, n: int) -> list[str]:
+    return list(dataset.cube.ranking("Area")[:n])
+
+
+def _plot_config(
+    dataset: Dataset, plot_type: str, x_axis: str, series_values: list[str]
+) -> PlotConfig:
+    group = str(dataset.frame["VariableGroup"].iloc[0])
+    return PlotConfig(
+        id="benchmark",
+        plot_type=plot_type,
+        x_axis=x_axis,
+        y_axis="Value",
+        variable_group=group,
+        subgroup="All",
+        variable="All",
+        series_by="Area" if x_axis == "Year" else "Year",
+        series_values=series_values,
+    )
+
+
+def _map_sidecar(path: Path) -> pd.DataFrame:
+    """Maps the Arrow sidecar of ``path`` the way a fresh worker would."""
+    reader = ipc.open_file(pa.memory_map(str(sidecar_path(path)), "r"))
+    return reader.read_all().to_pandas(split_blocks=True)
+
+
+def bench_ingest(path: Path, repeat: int) -> tuple[dict, Dataset]:
+    results = {
+        "ingest.read_csv": measure(lambda: read_csv(path), repeat),
+        "ingest.file_hash": measure(lambda: file_hash(path), repeat),
+    }
+    # Writes the sidecar next to the generated CSV on first use.
+    dataset = load_dataset(path)
+    results["ingest.map_sidecar"] = measure(lambda: _map_sidecar(path), repeat)
+    return results, dataset
+
+
+def bench_indexes(dataset: Dataset, repeat: int) -> dict:
+    frame = dataset.frame
+    hierarchy = dataset.hierarchy
+
+    def cascade():
+        for group in hierarchy.variable_groups:
+            for subgroup in hierarchy.subgroups(group):
+                hierarchy.variables(group, subgroup)
+
+    group = str(frame["VariableGroup"].iloc[0])
+    results = {
+        "dropdown.build_hierarchy": measure(lambda: HierarchyIndex(frame), repeat),
+        "dropdown.cascade": measure(cascade, repeat),
+        "filter.build_index": measure(
+            lambda: FilterIndex(frame).positions({"VariableGroup": [group]}),
+            repeat,
+        ),
+        "cube.build": measure(lambda: AggregateCube(frame), repeat),
+    }
+    dataset.filter_index.positions({"VariableGroup": [group]})
+    results["filter.select"] = measure(
+        lambda: dataset.filter_index.select(group, "All", "All"), repeat
+    )
+    return results
+
+
+def bench_ranking(dataset: Dataset, repeat: int) -> dict:
+    group = str(dataset.frame["VariableGroup"].iloc[0])
+    dataset.cube.ranking("Area")
+    results = {}
+    for series_by in ("Area", "Year"):
+        results[f"ranking.{series_by.lower()}.cold"] = measure(
+            lambda: ranking._compute_ranking(dataset, group, "All", "All", series_by),
+            repeat,
+        )
+        # Fill the cache first so every timed call is a hit.
+        ranking.series_ranking(dataset, group, "All", "All", series_by)
+        results[f"ranking.{series_by.lower()}.cached"] = measure(
+            lambda: ranking.series_ranking(dataset, group, "All", "All", series_by),
+            repeat,
+        )
+    options = ranking.series_ranking(dataset, group, "All", "All", "Area").options
+
+    def type_query():
+        search = ranking.SeriesRanking(options)
+        for end in range(1, len("area 1") + 1):
+            search.search("area 1"[:end])
+
+    results["ranking.search"] = measure(type_query, repeat)
+    return results
+
+
+def bench_figures(dataset: Dataset, repeat: int) -> dict:
+    areas = _top_areas(dataset, 10)
+    results = {}
+    for plot_type in PLOT_TYPES:
+        config = _plot_config(dataset, plot_type, "Year", areas)
+        results[f"figure.{plot_type.replace(' ', '_')}"] = measure(
+            lambda: build_figure(dataset, config), repeat
+        )
+    config = _plot_config(dataset, "scatter", "Area", [])
+    results["figure.scatter_by_area"] = measure(
+        lambda: build_figure(dataset, config), repeat
+    )
+    return results
+
+
+def bench_slices(dataset: Dataset, repeat: int) -> dict:
+    areas = _top_areas(dataset, 20)
+    plots = [
+        _plot_config(dataset, PLOT_TYPES[i % len(PLOT_TYPES)], "Year", areas)
+        for i in range(100)
+    ]
+    plots = [p.model_copy(update={"id": f"plot-{i}"}) for i, p in enumerate(plots)]
+    slices = [Slice(id=f"slice-{i}", name=f"Slice {i}", plots=plots) for i in range(10)]
+    legacy_json = json.dumps([s.model_dump() for s in slices])
+    blobs = [encode_slice(s) for s in slices]
+    return {
+        "slices.encode": measure(lambda: [encode_slice(s) for s in slices], repeat),
+        "slices.decode": measure(lambda: [decode_slice(b) for b in blobs], repeat),
+        "slices.parse_legacy_json": measure(lambda: parse_slices(legacy_json), repeat),
+    }
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(sizes: list[str], data_dir: Path, repeat: int, seed: int) -> dict:
+    report = {
+        "version": REPORT_VERSION,
+        "commit": _git_commit(),
+        "created": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "cpus": os.cpu_count(),
+        "seed": seed,
+        "sizes": {},
+    }
+    for size in sizes:
+        path = dataset_path(data_dir, size, seed)
+        ingest_repeat = max(1, repeat // 5)
+        results, dataset = bench_ingest(path, ingest_repeat)
+        results.update(bench_indexes(dataset, repeat))
+        results.update(bench_ranking(dataset, repeat))
+        results.update(bench_figures(dataset, repeat))
+        results.update(bench_slices(dataset, repeat))
+        report["sizes"][size] = {"rows": len(dataset.frame), "results": results}
+        print(f"{size}: {len(results)} benchmarks")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes",
+        default="100k,1m",
+        help=f"comma-separated sizes out of {', '.join(SIZES)}",
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--data-dir",
+        type=Path,
+        default=Path(tempfile.gettempdir()) / "dataviz-benchmarks",
+    )
+    parser.add_argument("--output", type=Path, default=Path("benchmark_report.json"))
+    args = parser.parse_args()
+    sizes = [size.strip() for size in args.sizes.split(",") if size.strip()]
+    unknown = [size for size in sizes if size not in SIZES]
+    if unknown:
+        parser.error(f"unknown sizes: {', '.join(unknown)}")
+    report = run(sizes, args.data_dir, args.repeat, args.seed)
+    args.output.write_text(json.dumps(report, indent=2))
+    print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,205 @@
+"""Reproducible AQUASTAT-shaped datasets for benchmarking.
+
+Rows are generated in fixed-size chunks, each from its own seeded random
+stream, so a file of any size is identical on every machine and never
+has to fit in memory.
+"""
+
+import argparse
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+GENERATOR_VERSION = "1"
+CHUNK_ROWS = 500_000
+SIZES = {
+    "100k": 100_000,
+    "1m": 1_000_000,
+    "10m": 10_000_000,
+    "50m": 50_000_000,
+}
+
+# (VariableGroup, Subgroup, Variable, Unit), modelled on the AQUASTAT core
+# dataset. Larger sizes add numbered variants so the hierarchy grows too.
+HIERARCHY = [
+    ("Geography and population", "Land use", "Total area of the country", "1000 ha"),
+    ("Geography and population", "Land use", "Arable land area", "1000 ha"),
+    ("Geography and population", "Population", "Total population", "1000 inhab"),
+    ("Geography and population", "Population", "Rural population", "1000 inhab"),
+    (
+        "Geography and population",
+        "Economy",
+        "Gross Domestic Product (GDP)",
+        "current US$",
+    ),
+    ("Geography and population", "Economy", "Human Development Index (HDI)", "-"),
+    (
+        "Water resources",
+        "Internal renewable water resources",
+        "Long-term average annual precipitation in volume",
+        "10^9 m3/year",
+    ),
+    (
+        "Water resources",
+        "Internal renewable water resources",
+        "Groundwater produced internally",
+        "10^9 m3/year",
+    ),
+    (
+        "Water resources",
+        "External renewable water resources",
+        "Surface water: inflow not submitted to treaties",
+        "10^9 m3/year",
+    ),
+    (
+        "Water resources",
+        "Total renewable water resources",
+        "Total renewable water resources per capita",
+        "m3/inhab/year",
+    ),
+    ("Water resources", "Dependency ratio", "Dependency ratio", "%"),
+    (
+        "Water use",
+        "Water withdrawal by sector",
+        "Agricultural water withdrawal",
+        "10^9 m3/year",
+    ),
+    (
+        "Water use",
+        "Water withdrawal by sector",
+        "Industrial water withdrawal",
+        "10^9 m3/year",
+    ),
+    (
+        "Water use",
+        "Water withdrawal by sector",
+        "Municipal water withdrawal",
+        "10^9 m3/year",
+    ),
+    (
+        "Water use",
+        "Water withdrawal by source",
+        "Fresh surface water withdrawal",
+        "10^9 m3/year",
+    ),
+    (
+        "Water use",
+        "Non-conventional sources of water",
+        "Desalinated water produced",
+        "10^9 m3/year",
+    ),
+    ("Pressure on water resources", "Water stress", "SDG 6.4.2. Water Stress", "%"),
+    (
+        "Pressure on water resources",
+        "Water use efficiency",
+        "SDG 6.4.1. Water Use Efficiency",
+        "US$/m3",
+    ),
+    (
+        "Agricultural water management",
+        "Irrigation",
+        "Area equipped for full control irrigation: total",
+        "1000 ha",
+    ),
+    (
+        "Agricultural water management",
+        "Irrigation",
+        "Area equipped for irrigation: actually irrigated",
+        "1000 ha",
+    ),
+    ("Agricultural water management", "Drainage", "Total drained area", "1000 ha"),
+    (
+        "Environment and health",
+        "Health",
+        "Total population with access to safe drinking-water",
+        "%",
+    ),
+    ("Environment and health", "Environment", "Number of dams", "-"),
+]
+SYMBOLS = np.array(["E", "I", "K", "L", "X"])
+SYMBOL_WEIGHTS = np.array([0.55, 0.2, 0.15, 0.05, 0.05])
+AREA_COUNT = 200
+FIRST_YEAR = 1960
+LAST_YEAR = 2022
+
+
+def _hierarchy(rows: int) -> list[tuple[str, str, str, str]]:
+    """The variable list, grown for large sizes so cells stay realistic.
+
+    Each variable covers about ``AREA_COUNT`` areas over every year, so
+    bigger files get more variables rather than duplicated cells.
+    """
+    cells_per_variable = AREA_COUNT * (LAST_YEAR - FIRST_YEAR + 1)
+    variants = max(1, -(-rows // (cells_per_variable * len(HIERARCHY))))
+    if variants == 1:
+        return HIERARCHY
+    return [
+        (group, subgroup, f"{variable} ({i + 1})", unit)
+        for i in range(variants)
+        for group, subgroup, variable, unit in HIERARCHY
+    ]
+
+
+def _chunk(
+    start: int, rows: int, seed: int, hierarchy: list[tuple[str, str, str, str]]
+) -> pd.DataFrame:
+    rng = np.random.default_rng([seed, start])
+    variable = rng.integers(0, len(hierarchy), rows)
+    area = rng.integers(0, AREA_COUNT, rows)
+    year = rng.integers(FIRST_YEAR, LAST_YEAR + 1, rows)
+    # Every (variable, area) pair gets a stable scale and trend, so rankings
+    # and line charts have structure rather than white noise.
+    pair = variable * AREA_COUNT + area
+    pair_rng = np.random.default_rng([seed, 0xA5])
+    scales = pair_rng.lognormal(3.0, 2.0, len(hierarchy) * AREA_COUNT)
+    trends = pair_rng.normal(0.01, 0.02, len(hierarchy) * AREA_COUNT)
+    value = scales[pair] * np.exp(trends[pair] * (year - FIRST_YEAR))
+    value *= rng.lognormal(0.0, 0.1, rows)
+    value = np.round(value, 2)
+    value[rng.random(rows) < 0.02] = np.nan
+    columns = list(zip(*hierarchy))
+    return pd.DataFrame(
+        {
+            "VariableGroup": np.array(columns[0])[variable],
+            "Subgroup": np.array(columns[1])[variable],
+            "Variable": np.array(columns[2])[variable],
+            "Area": np.char.add("Area ", np.char.zfill(area.astype(str), 3)),
+            "Year": year,
+            "Value": value,
+            "Unit": np.array(columns[3])[variable],
+            "Symbol": rng.choice(SYMBOLS, rows, p=SYMBOL_WEIGHTS),
+        }
+    )
+
+
+def write_csv(path: Path, rows: int, seed: int = 0, chunk_rows: int = CHUNK_ROWS):
+    """Writes ``rows`` synthetic AQUASTAT rows to ``path`` in long format."""
+    hierarchy = _hierarchy(rows)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with tmp_path.open("w", newline="") as f:
+        for start in range(0, rows, chunk_rows):
+            chunk = _chunk(start, min(chunk_rows, rows - start), seed, hierarchy)
+            chunk.to_csv(f, index=False, header=start == 0)
+    tmp_path.replace(path)
+
+
+def dataset_path(data_dir: Path, size: str, seed: int = 0) -> Path:
+    """Returns the CSV for a named size, generating it on first use."""
+    path = data_dir / f"aquastat_{size}_s{seed}_v{GENERATOR_VERSION}.csv"
+    if not path.exists():
+        data_dir.mkdir(parents=True, exist_ok=True)
+        write_csv(path, SIZES[size], seed)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("size", choices=SIZES)
+    parser.add_argument("output", type=Path)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    write_csv(args.output, SIZES[args.size], args.seed)
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file